@@ -3,105 +3,290 @@ import numpy as np
 import json
 import os
 import math
+import hashlib
+import inspect
+import sys
+import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-def analyze_earth_texture(image_path='earth_texture.jpg', output_path='earth_regions.json'):
+from region_grid import write_region_grid
+from region_index import REGION_INDEX, REGION_RULES
+
+# Feature classes in rule order; the index is the label used by the vectorized engine
+FEATURES = ("ocean", "shallow_water", "ice", "vegetation", "desert", "land")
+LAND = FEATURES.index("land")
+TEXTURE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp', '.npy')
+
+def classify_pixel(pixel):
     """
-    Analyzes the earth texture image to identify land and water regions
-    and generates a mapping of grid cells to geographic features.
+    Classify a single RGB pixel. Used by the legacy per-pixel engine;
+    classify_pixels() applies the same rules to whole arrays.
     """
-    print(f"Analyzing earth texture from {image_path}...")
-    
-    # Check if the image exists
-    if not os.path.exists(image_path):
-        print(f"Error: Image file {image_path} not found")
-        return False
-    
-    # Load image
+    r, g, b = pixel
+
+    # Deep blue = ocean
+    if b > 150 and r < 100 and g < 130:
+        return "ocean"
+    # Lighter blue = shallow water
+    elif b > 150 and r > 100 and g > 130:
+        return "shallow_water"
+    # White = ice/snow
+    elif r > 200 and g > 200 and b > 200:
+        return "ice"
+    # Green = vegetation
+    elif g > 120 and g > r and g > b:
+        return "vegetation"
+    # Brown/tan = desert/mountains
+    elif r > 150 and g > 100 and b < 100:
+        return "desert"
+    # Other
+    else:
+        return "land"
+
+def classify_pixels(r, g, b):
+    """
+    Vectorized classify_pixel(): takes the three channel planes of an image
+    (or band of one) and returns a uint8 array of indices into FEATURES.
+    Rules are applied last-to-first so earlier rules win, exactly like the if-chain.
+    """
+    labels = np.full(r.shape, LAND, dtype=np.uint8)
+    labels[(r > 150) & (g > 100) & (b < 100)] = FEATURES.index("desert")
+    labels[(g > 120) & (g > r) & (g > b)] = FEATURES.index("vegetation")
+    labels[(r > 200) & (g > 200) & (b > 200)] = FEATURES.index("ice")
+    labels[(b > 150) & (r > 100) & (g > 130)] = FEATURES.index("shallow_water")
+    labels[(b > 150) & (r < 100) & (g < 130)] = FEATURES.index("ocean")
+    return labels
+
+def cell_edges(size, cells):
+    """Pixel boundaries of each grid cell along one axis (same rounding as the legacy loop)."""
+    return [int(i * size / cells) for i in range(cells + 1)]
+
+def count_band(labels, col_edges, row_offset, width):
+    """
+    Per-cell class histogram for one latitude band of labels.
+
+    Returns (counts, first): counts[x, k] is the number of pixels of class k in
+    cell column x, first[x, k] is the row-major image index (row * width + col)
+    of the first such pixel, or the int64 maximum when absent.
+    The first-seen index preserves the legacy feature ordering in the JSON.
+    """
+    starts = np.asarray(col_edges[:-1])
+    n_cells = len(starts)
+    sentinel = np.iinfo(np.int64).max
+    counts = np.zeros((n_cells, len(FEATURES)), dtype=np.int64)
+    first = np.full((n_cells, len(FEATURES)), sentinel, dtype=np.int64)
+    cols = np.arange(labels.shape[1], dtype=np.int64)
+    for k in range(len(FEATURES)):
+        mask = labels == k
+        col_counts = mask.sum(axis=0)
+        counts[:, k] = np.add.reduceat(col_counts, starts)
+        first_row = mask.argmax(axis=0).astype(np.int64) + row_offset
+        keys = np.where(col_counts > 0, first_row * width + cols, sentinel)
+        first[:, k] = np.minimum.reduceat(keys, starts)
+    return counts, first
+
+def analyze_cells_vectorized(read_rows, height, width, grid_width, grid_height, band_rows=None, bands=None):
+    """
+    Classify the image with NumPy masks, one latitude band at a time,
+    and return (counts, first) arrays indexed [grid_y, grid_x, feature].
+
+    read_rows(y_start, y_end) returns that horizontal slice of the image in
+    OpenCV's BGR channel order, so no RGB copy is ever made. band_rows caps
+    how many rows are read at once; a latitude row taller than that is
+    processed in several chunks. bands restricts the scan to those latitude
+    rows (counted from the top of the image); the others are left at zero.
+    """
+    row_edges = cell_edges(height, grid_height)
+    col_edges = cell_edges(width, grid_width)
+    counts = np.zeros((grid_height, grid_width, len(FEATURES)), dtype=np.int64)
+    first = np.zeros_like(counts)
+    for band in (bands if bands is not None else range(grid_height)):
+        y_start, y_end = row_edges[band], row_edges[band + 1]
+        # Invert y because image 0,0 is top-left but geographic grid is bottom-up
+        y = grid_height - band - 1
+        step = band_rows or (y_end - y_start)
+        for chunk_start in range(y_start, y_end, step):
+            rows = read_rows(chunk_start, min(chunk_start + step, y_end))
+            labels = classify_pixels(rows[..., 2], rows[..., 1], rows[..., 0])
+            chunk_counts, chunk_first = count_band(labels, col_edges, chunk_start, width)
+            if chunk_start == y_start:
+                counts[y], first[y] = chunk_counts, chunk_first
+            else:
+                counts[y] += chunk_counts
+                np.minimum(first[y], chunk_first, out=first[y])
+    return counts, first
+
+def analyze_band_range(cache_path, band_start, band_end, grid_width, grid_height, band_rows=None):
+    """
+    Process-pool job: classify latitude rows [band_start, band_end) of a .npy
+    texture cache and return their (counts, first) histograms, grid_y ascending.
+    """
+    reader = NpyBandReader(cache_path)
     try:
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"Error: Could not load image {image_path}")
-            return False
-        
-        # Convert to RGB (OpenCV loads as BGR)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # Get dimensions
-        height, width, _ = img.shape
-        print(f"Image dimensions: {width}x{height}")
-    except Exception as e:
-        print(f"Error loading image: {e}")
-        return False
-    
-    # Create grid
-    grid_width = 48  # Number of longitude cells (2x the segments in the THREE.js grid)
-    grid_height = 24  # Number of latitude cells
-    
-    # Region data structure
-    regions = {}
-    
-    # Helper function to classify color
-    def classify_pixel(pixel):
-        r, g, b = pixel
-        
-        # Deep blue = ocean
-        if b > 150 and r < 100 and g < 130:
-            return "ocean"
-        # Lighter blue = shallow water
-        elif b > 150 and r > 100 and g > 130:
-            return "shallow_water"
-        # White = ice/snow
-        elif r > 200 and g > 200 and b > 200:
-            return "ice"
-        # Green = vegetation
-        elif g > 120 and g > r and g > b:
-            return "vegetation"
-        # Brown/tan = desert/mountains
-        elif r > 150 and g > 100 and b < 100:
-            return "desert"
-        # Other
+        counts, first = analyze_cells_vectorized(reader.read, reader.height, reader.width, grid_width, grid_height,
+                                                 band_rows, bands=range(band_start, band_end))
+    finally:
+        reader.close()
+    rows = slice(grid_height - band_end, grid_height - band_start)
+    return counts[rows], first[rows]
+
+def analyze_cells_parallel(cache_path, grid_width, grid_height, workers, band_rows=None):
+    """
+    Split the latitude rows into contiguous bands, classify them across a
+    process pool and merge the per-cell histograms in band order. Each grid
+    row is owned by exactly one job, so the result matches the single-process scan.
+    """
+    n_jobs = min(grid_height, workers * 4)
+    edges = [grid_height * i // n_jobs for i in range(n_jobs + 1)]
+    counts = np.zeros((grid_height, grid_width, len(FEATURES)), dtype=np.int64)
+    first = np.zeros_like(counts)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(analyze_band_range, cache_path, edges[i], edges[i + 1], grid_width, grid_height, band_rows)
+                for i in range(n_jobs)]
+        for i, job in enumerate(jobs):
+            rows = slice(grid_height - edges[i + 1], grid_height - edges[i])
+            counts[rows], first[rows] = job.result()
+    return counts, first
+
+class NpyBandReader:
+    """
+    Reads horizontal bands of an (height, width, 3) uint8 .npy image straight
+    from disk, so only the requested rows are ever resident in memory.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        version = np.lib.format.read_magic(self.file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(self.file)
         else:
-            return "land"
-    
-    print("Analyzing grid cells...")
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(self.file)
+        if fortran_order or dtype != np.uint8 or len(shape) != 3 or shape[2] != 3:
+            self.file.close()
+            raise ValueError(f"{path} is not a C-ordered uint8 BGR image array")
+        self.height, self.width, _ = shape
+        self.offset = self.file.tell()
+
+    def read(self, y_start, y_end):
+        row_bytes = self.width * 3
+        self.file.seek(self.offset + y_start * row_bytes)
+        rows = np.fromfile(self.file, dtype=np.uint8, count=(y_end - y_start) * row_bytes)
+        return rows.reshape(y_end - y_start, self.width, 3)
+
+    def close(self):
+        self.file.close()
+
+def load_texture(image_path):
+    """
+    The whole texture as a BGR uint8 array, or None if it can't be decoded.
+    .npy textures are memory-mapped rather than read, so only the rows
+    actually touched are paged in.
+    """
+    if image_path.lower().endswith('.npy'):
+        img = np.load(image_path, mmap_mode='r')
+        if img.dtype != np.uint8 or img.ndim != 3 or img.shape[2] != 3:
+            raise ValueError(f"{image_path} is not a uint8 BGR image array")
+        return img
+    return cv2.imread(image_path)
+
+def texture_cache_path(image_path):
+    """Location of the decoded .npy cache used by streaming mode."""
+    if image_path.lower().endswith('.npy'):
+        return image_path
+    return os.path.splitext(image_path)[0] + '.bgr.npy'
+
+def ensure_texture_cache(image_path):
+    """
+    Decode image_path once into a raw BGR .npy file next to it. The decoder
+    still needs the whole image for that one pass (OpenCV cannot decode in
+    strips), but it skips the RGB copy and every later streaming run reads
+    the cache band by band. The cache is rebuilt when the image is newer.
+    """
+    cache_path = texture_cache_path(image_path)
+    if cache_path == image_path or (
+            os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(image_path)):
+        return cache_path
+    print(f"Building texture cache {cache_path}...")
+    img = cv2.imread(image_path)
+    if img is None:
+        raise ValueError(f"Could not load image {image_path}")
+    np.save(cache_path, img)
+    return cache_path
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def analyze_cells_legacy(img, grid_width, grid_height):
+    """
+    Original per-pixel engine. Returns {(x, y): {feature: count}} with features in
+    first-seen order. Kept as the reference for benchmark_earth_texture.py.
+    """
+    height, width, _ = img.shape
+    cells = {}
     for y in range(grid_height):
         for x in range(grid_width):
             # Calculate cell boundaries in image
             cell_x_start = int(x * width / grid_width)
             cell_x_end = int((x + 1) * width / grid_width)
-            
+
             # Invert y because image 0,0 is top-left but geographic grid is bottom-up
             cell_y_start = int((grid_height - y - 1) * height / grid_height)
             cell_y_end = int((grid_height - y) * height / grid_height)
-            
+
             # Sample pixels from this cell
             cell_img = img[cell_y_start:cell_y_end, cell_x_start:cell_x_end]
             pixels = cell_img.reshape(-1, 3)
-            
+
             # Calculate feature distribution
             features = defaultdict(int)
             for pixel in pixels:
                 feature = classify_pixel(pixel)
                 features[feature] += 1
-            
+            cells[(x, y)] = dict(features)
+    return cells
+
+def cell_histogram(counts, first, x, y):
+    """Convert one cell of the vectorized result to {feature: count} in first-seen order."""
+    cell_counts = counts[y, x].tolist()
+    cell_first = first[y, x].tolist()
+    present = [k for k in range(len(FEATURES)) if cell_counts[k]]
+    present.sort(key=lambda k: cell_first[k])
+    return {FEATURES[k]: cell_counts[k] for k in present}
+
+def build_regions(histograms, grid_width, grid_height):
+    """
+    Turn per-cell feature counts ({(x, y): {feature: count}}) into the
+    earth_regions.json "cells" mapping.
+    """
+    regions = {}
+    for y in range(grid_height):
+        for x in range(grid_width):
+            counts = histograms[(x, y)]
+
             # Normalize to percentages
-            total_pixels = len(pixels)
-            features = {k: round(v / total_pixels * 100, 1) for k, v in features.items()}
-            
+            total_pixels = sum(counts.values())
+            features = {k: round(v / total_pixels * 100, 1) for k, v in counts.items()}
+
             # Calculate geographic coordinates of cell center
             # Longitude: -180 to 180, with -180 at x=0 and 180 at x=grid_width
             longitude = (x / grid_width * 360) - 180
-            
+
             # Latitude: 90 to -90, with 90 at y=0 and -90 at y=grid_height
             latitude = 90 - (y / grid_height * 180)
-            
+
             # Determine primary feature
             primary_feature = max(features.items(), key=lambda x: x[1])[0]
-            
+
             # Determine region name based on features and coordinates
             region_name = determine_region(longitude, latitude, features)
-            
+
             # Store cell data
             regions[f"{x}_{y}"] = {
                 "cell_id": f"{x}_{y}",
@@ -113,16 +298,253 @@ def analyze_earth_texture(image_path='earth_texture.jpg', output_path='earth_reg
                 "features": features,
                 "region": region_name
             }
-            
+
             # Progress report every 100 cells
             if (y * grid_width + x) % 100 == 0:
                 print(f"Processed {y * grid_width + x} cells...")
-    
-    # Save to JSON file
-    try:
-        with open(output_path, 'w') as f:
+    return regions
+
+def aggregate_level(counts, first, grid_width, grid_height):
+    """
+    Build a coarser grid from finer (counts, first) arrays by summing each
+    block of child cells. The fine grid must be an integer multiple of the coarse one.
+    """
+    fine_height, fine_width, n_features = counts.shape
+    shape = (grid_height, fine_height // grid_height, grid_width, fine_width // grid_width, n_features)
+    return counts.reshape(shape).sum(axis=(1, 3)), first.reshape(shape).min(axis=(1, 3))
+
+def level_path(output_path, grid_width, grid_height):
+    """File name for a pyramid level, e.g. earth_regions_96x48.json."""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_{grid_width}x{grid_height}{ext}"
+
+def write_regions(path, histograms, grid_width, grid_height, output_format='json'):
+    """
+    Write one level as JSON, as the binary region grid (same name with a
+    .bin extension, see region_grid.py) or both. Returns the written paths
+    as {"file": json path, "binary": bin path}.
+    """
+    regions = build_regions(histograms, grid_width, grid_height)
+    written = {}
+    if output_format in ('json', 'both'):
+        with open(path, 'w') as f:
             json.dump({"grid_size": {"width": grid_width, "height": grid_height}, "cells": regions}, f, indent=2)
-        print(f"Successfully saved data to {output_path}")
+        written["file"] = path
+    if output_format in ('binary', 'both'):
+        written["binary"] = os.path.splitext(path)[0] + '.bin'
+        write_region_grid(written["binary"], grid_width, grid_height, regions, FEATURES)
+    for written_path in written.values():
+        print(f"Successfully saved data to {written_path}")
+    return written
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def rules_fingerprint(*rules):
+    """
+    Hash of the given functions' source (or the repr of rule tables), so
+    editing a rule invalidates its cache entries.
+    """
+    digest = hashlib.sha256()
+    for rule in rules:
+        digest.update((inspect.getsource(rule) if callable(rule) else repr(rule)).encode())
+    return digest.hexdigest()
+
+def histogram_cache_key(image_path, grid):
+    """Cache key for per-cell histograms: texture bytes, finest grid and classification thresholds."""
+    parts = [file_sha256(image_path), "%dx%d" % grid,
+             rules_fingerprint(classify_pixels, count_band, cell_edges)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+def output_cache_key(histogram_key, levels, output_path, output_format):
+    """Cache key for the written files: histograms plus every level, the output format and the region rules."""
+    parts = [histogram_key, ",".join("%dx%d" % level for level in levels), os.path.abspath(output_path), output_format,
+             rules_fingerprint(aggregate_level, cell_histogram, build_regions, determine_region,
+                               REGION_RULES, write_region_grid)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+def load_cached_histograms(cache_dir, key):
+    path = os.path.join(cache_dir, f"{key}.npz")
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as cached:
+        return cached["counts"], cached["first"]
+
+def save_cached_histograms(cache_dir, key, counts, first):
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(os.path.join(cache_dir, f"{key}.npz"), counts=counts, first=first)
+
+def outputs_current(cache_dir, key):
+    """True when every file recorded under key still exists with the same content."""
+    path = os.path.join(cache_dir, f"{key}.outputs.json")
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        outputs = json.load(f)
+    return all(os.path.exists(out) and file_sha256(out) == digest for out, digest in outputs.items())
+
+def record_outputs(cache_dir, key, paths):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, f"{key}.outputs.json"), 'w') as f:
+        json.dump({path: file_sha256(path) for path in paths}, f, indent=2)
+
+def scan_texture(image_path, engine, levels, stream, band_rows, workers):
+    """
+    Load the texture and classify it at the finest level.
+    Returns (counts, first, None) for the vectorized engine, (None, None,
+    [histograms per level]) for the legacy engine, or None on error.
+    """
+    finest_width, finest_height = levels[-1]
+
+    # Load image
+    reader = None
+    try:
+        if stream or workers > 1:
+            cache_path = ensure_texture_cache(image_path)
+            reader = NpyBandReader(cache_path)
+            height, width = reader.height, reader.width
+            read_rows = reader.read
+        else:
+            img = load_texture(image_path)
+            if img is None:
+                print(f"Error: Could not load image {image_path}")
+                return None
+
+            # The legacy engine works on RGB pixels (OpenCV loads as BGR);
+            # the vectorized engine reads the BGR planes directly
+            if engine == 'legacy':
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            height, width, _ = img.shape
+            read_rows = lambda y_start, y_end: img[y_start:y_end]
+
+        # Get dimensions
+        print(f"Image dimensions: {width}x{height}")
+    except Exception as e:
+        print(f"Error loading image: {e}")
+        if reader:
+            reader.close()
+        return None
+
+    try:
+        if width < finest_width or height < finest_height:
+            print(f"Error: Image must be at least {finest_width}x{finest_height} pixels")
+            return None
+
+        print("Analyzing grid cells...")
+        if engine == 'legacy':
+            return None, None, [analyze_cells_legacy(img, level_width, level_height)
+                                for level_width, level_height in levels]
+        if workers > 1:
+            counts, first = analyze_cells_parallel(cache_path, finest_width, finest_height, workers, band_rows)
+        else:
+            counts, first = analyze_cells_vectorized(read_rows, height, width, finest_width, finest_height, band_rows)
+        return counts, first, None
+    finally:
+        if reader:
+            reader.close()
+        peak = peak_rss_mb()
+        if peak is not None:
+            print(f"Peak RSS: {peak:.1f} MB")
+
+def analyze_earth_texture(image_path='earth_texture.jpg', output_path='earth_regions.json', engine='vectorized',
+                          grid_width=48, grid_height=24, levels=None, stream=False, band_rows=None, workers=1,
+                          cache_dir=None, output_format='json'):
+    """
+    Analyzes the earth texture image to identify land and water regions
+    and generates a mapping of grid cells to geographic features.
+    engine='legacy' runs the original per-pixel loop.
+
+    levels is an optional list of (grid_width, grid_height) pairs. The finest
+    level is computed from the pixels and every coarser level is aggregated
+    from it; each must divide the finest evenly. The coarsest level is written
+    to output_path, finer ones to earth_regions_<w>x<h>.json, and
+    earth_regions_levels.json lists them coarse to fine for the globe client.
+
+    stream=True reads the texture in horizontal bands (at most band_rows
+    rows each) from a decoded .npy cache instead of holding it in memory.
+    workers > 1 splits the latitude rows across a process pool; the workers
+    read their bands from the same .npy cache.
+
+    cache_dir enables the content-addressed cache (vectorized engine only):
+    nothing is redone when the texture, grid and rules are unchanged, and
+    when only the region rules changed the cached per-cell histograms are
+    relabelled without touching the pixels.
+
+    output_format is 'json', 'binary' (compact region grid, see
+    region_grid.py) or 'both'.
+    """
+    if (stream or workers > 1) and engine == 'legacy':
+        print("Error: Streaming and parallel modes require the vectorized engine")
+        return False
+
+    print(f"Analyzing earth texture from {image_path}...")
+
+    # Check if the image exists
+    if not os.path.exists(image_path):
+        print(f"Error: Image file {image_path} not found")
+        return False
+
+    # Create grid (default 48 longitude cells, 2x the segments in the THREE.js grid, by 24 latitude cells)
+    levels = sorted(set(levels or [(grid_width, grid_height)]), key=lambda level: level[0] * level[1])
+    finest_width, finest_height = levels[-1]
+    for level_width, level_height in levels:
+        if finest_width % level_width or finest_height % level_height:
+            print(f"Error: Grid {level_width}x{level_height} does not evenly divide {finest_width}x{finest_height}")
+            return False
+
+    scan = None
+    use_cache = cache_dir and engine != 'legacy'
+    if use_cache:
+        histogram_key = histogram_cache_key(image_path, levels[-1])
+        output_key = output_cache_key(histogram_key, levels, output_path, output_format)
+        if outputs_current(cache_dir, output_key):
+            print(f"Cache hit: {output_path} is up to date")
+            return True
+        cached = load_cached_histograms(cache_dir, histogram_key)
+        if cached is not None:
+            print("Cache hit: reusing per-cell histograms, recomputing regions")
+            scan = cached + (None,)
+
+    if scan is None:
+        scan = scan_texture(image_path, engine, levels, stream, band_rows, workers)
+        if scan is None:
+            return False
+        if use_cache:
+            save_cached_histograms(cache_dir, histogram_key, scan[0], scan[1])
+
+    counts, first, level_histograms = scan
+    if level_histograms is None:
+        level_histograms = []
+        for level_width, level_height in levels:
+            level_counts, level_first = aggregate_level(counts, first, level_width, level_height)
+            level_histograms.append({(x, y): cell_histogram(level_counts, level_first, x, y)
+                                     for y in range(level_height) for x in range(level_width)})
+
+    # Save to JSON files
+    try:
+        written = []
+        manifest = []
+        for (level_width, level_height), histograms in zip(levels, level_histograms):
+            path = output_path if not manifest else level_path(output_path, level_width, level_height)
+            level_files = write_regions(path, histograms, level_width, level_height, output_format)
+            written.extend(level_files.values())
+            manifest.append({"width": level_width, "height": level_height,
+                             **{key: os.path.basename(level_file) for key, level_file in level_files.items()}})
+
+        if len(levels) > 1:
+            stem, ext = os.path.splitext(output_path)
+            manifest_path = f"{stem}_levels{ext}"
+            with open(manifest_path, 'w') as f:
+                json.dump({"levels": manifest}, f, indent=2)
+            written.append(manifest_path)
+            print(f"Successfully saved level index to {manifest_path}")
+
+        if use_cache:
+            record_outputs(cache_dir, output_key, written)
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
@@ -130,81 +552,68 @@ def analyze_earth_texture(image_path='earth_texture.jpg', output_path='earth_reg
 
 def determine_region(longitude, latitude, features):
     """
-    Determine region name based on coordinates and features
-    This is a simplified version that could be expanded with more detailed region mapping
-    """
-    # Simple continental regions based on longitude/latitude
-    if latitude > 66:
-        return "Arctic"
-    elif latitude < -66:
-        return "Antarctica"
-    
-    # North America
-    elif longitude < -30 and longitude > -170 and latitude > 15:
-        if features.get("ice", 0) > 30:
-            return "Greenland"
-        elif longitude < -140:
-            return "Alaska"
-        elif longitude < -50:
-            return "North America"
-        else:
-            return "Canada"
-    
-    # South America
-    elif longitude < -30 and longitude > -90 and latitude < 15 and latitude > -60:
-        return "South America"
-    
-    # Europe
-    elif longitude > -10 and longitude < 40 and latitude > 35:
-        return "Europe"
-    
-    # Africa
-    elif longitude > -20 and longitude < 55 and latitude < 35 and latitude > -35:
-        if features.get("desert", 0) > 40:
-            return "Sahara Desert"
-        return "Africa"
-    
-    # Asia
-    elif longitude > 40 and longitude < 150 and latitude > 0:
-        if latitude > 50 and longitude > 60:
-            return "Siberia"
-        elif longitude > 90 and longitude < 135 and latitude > 20 and latitude < 40:
-            return "China"
-        elif longitude > 65 and longitude < 90 and latitude > 5 and latitude < 35:
-            return "India"
-        elif longitude > 120 and latitude > 30:
-            return "Japan"
-        return "Asia"
-    
-    # Australia
-    elif longitude > 110 and longitude < 155 and latitude < 0 and latitude > -40:
-        return "Australia"
-    
-    # Pacific Ocean
-    elif (longitude > 150 or longitude < -120) and latitude < 50 and latitude > -50:
-        return "Pacific Ocean"
-    
-    # Atlantic Ocean
-    elif longitude > -60 and longitude < 0 and latitude < 50 and latitude > -50:
-        return "Atlantic Ocean"
-    
-    # Indian Ocean
-    elif longitude > 40 and longitude < 110 and latitude < 20 and latitude > -50:
-        return "Indian Ocean"
-    
-    # Default to using the primary feature as a generic region name
-    else:
-        if features.get("ocean", 0) > 50:
-            return "Ocean"
-        elif features.get("ice", 0) > 30:
-            return "Ice Cap"
-        elif features.get("desert", 0) > 40:
-            return "Desert"
-        elif features.get("vegetation", 0) > 40:
-            return "Forest"
-        else:
-            return "Land"
+    Determine region name based on coordinates and features.
+    The rules live in region_index.REGION_RULES and are answered by the
+    precompiled interval index; use region_index.region_at() for
+    arbitrary points or whole arrays of coordinates.
+    """
+    return REGION_INDEX.region_at(latitude, longitude, features)
+
+def analyze_texture_directory(directory, output_dir=None, workers=1, **options):
+    """
+    Batch mode: analyze every texture in directory, one texture per pool
+    worker, writing <name>_regions.json (plus any pyramid levels) to output_dir.
+    Returns {texture filename: success}.
+    """
+    output_dir = output_dir or directory
+    os.makedirs(output_dir, exist_ok=True)
+    textures = sorted(fn for fn in os.listdir(directory)
+                      if fn.lower().endswith(TEXTURE_EXTENSIONS) and not fn.endswith('.bgr.npy'))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = {fn: pool.submit(analyze_earth_texture, os.path.join(directory, fn),
+                                os.path.join(output_dir, f"{os.path.splitext(fn)[0]}_regions.json"), **options)
+                for fn in textures}
+        return {fn: job.result() for fn, job in jobs.items()}
+
+def parse_grid(value):
+    """Parse a "WxH" grid size argument."""
+    try:
+        grid_width, grid_height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH, got {value!r}")
+    return grid_width, grid_height
 
 if __name__ == "__main__":
-    analyze_earth_texture()
-    print("Done! The earth_regions.json file can now be used by the web application.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build earth_regions.json from an equirectangular earth texture")
+    parser.add_argument("image_path", nargs="?", help="texture (default earth_texture.jpg), or directory with --batch")
+    parser.add_argument("output_path", nargs="?", help="JSON output (default earth_regions.json), or directory with --batch")
+    parser.add_argument("--engine", choices=["vectorized", "legacy"], default="vectorized",
+                        help="vectorized NumPy classifier (default) or the original per-pixel loop")
+    parser.add_argument("--grid", type=parse_grid, default=(48, 24), metavar="WxH",
+                        help="grid resolution for a single-level run (default 48x24)")
+    parser.add_argument("--levels", type=lambda value: [parse_grid(level) for level in value.split(",")],
+                        metavar="WxH,...", help="emit a region pyramid, e.g. 48x24,96x48,192x96,384x192")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the texture in bands from a .npy cache to bound memory use")
+    parser.add_argument("--band-rows", type=int, default=None,
+                        help="maximum rows per band in streaming mode (default: one latitude row)")
+    parser.add_argument("--cache-dir", default=".earth_cache",
+                        help="content-addressed analysis cache (default .earth_cache)")
+    parser.add_argument("--no-cache", action="store_true", help="always rescan the texture")
+    parser.add_argument("--format", choices=["json", "binary", "both"], default="json",
+                        help="write earth_regions.json, the compact earth_regions.bin grid, or both")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="process pool size for parallel band analysis (or batch mode)")
+    parser.add_argument("--batch", action="store_true",
+                        help="treat image_path as a directory of textures and output_path as the output directory")
+    args = parser.parse_args()
+    options = dict(engine=args.engine, grid_width=args.grid[0], grid_height=args.grid[1], levels=args.levels,
+                   stream=args.stream, band_rows=args.band_rows,
+                   cache_dir=None if args.no_cache else args.cache_dir, output_format=args.format)
+    if args.batch:
+        results = analyze_texture_directory(args.image_path or ".", args.output_path, workers=args.workers, **options)
+        print(f"Analyzed {sum(results.values())}/{len(results)} textures")
+    else:
+        analyze_earth_texture(args.image_path or "earth_texture.jpg", args.output_path or "earth_regions.json",
+                              workers=args.workers, **options)
+    print("Done! The earth_regions.json file can now be used by the web application.")
@@ -0,0 +1,62 @@
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from analyze_earth_texture import analyze_earth_texture
+
+def make_synthetic_texture(path, width, height, seed=0):
+    """
+    Write a noisy equirectangular-ish test texture: blue oceans, green/tan
+    continents and white poles, with per-pixel noise so every class shows up.
+    """
+    rng = np.random.default_rng(seed)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = (40, 70, 190)  # ocean
+    yy, xx = np.mgrid[0:height, 0:width]
+    land = (np.sin(xx / width * 12) + np.cos(yy / height * 7)) > 0.6
+    img[land] = (60, 150, 70)  # vegetation
+    img[land & (yy > height // 2)] = (190, 150, 80)  # desert
+    img[(yy < height // 12) | (yy > height * 11 // 12)] = (235, 235, 235)  # ice
+    noise = rng.integers(-60, 60, size=img.shape)
+    img = np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    # cv2 writes BGR
+    cv2.imwrite(path, cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed:.2f}s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and vectorized earth texture engines")
+    parser.add_argument("image_path", nargs="?", help="texture to analyze (default: generate a synthetic one)")
+    parser.add_argument("--width", type=int, default=1024, help="synthetic texture width")
+    parser.add_argument("--height", type=int, default=512, help="synthetic texture height")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = args.image_path
+        if not image_path:
+            image_path = os.path.join(tmp, "synthetic_earth.png")
+            make_synthetic_texture(image_path, args.width, args.height)
+        legacy_out = os.path.join(tmp, "legacy.json")
+        vector_out = os.path.join(tmp, "vectorized.json")
+
+        legacy = timed("legacy", lambda: analyze_earth_texture(image_path, legacy_out, engine="legacy"))
+        vector = timed("vectorized", lambda: analyze_earth_texture(image_path, vector_out, engine="vectorized"))
+
+        identical = filecmp.cmp(legacy_out, vector_out, shallow=False)
+        print(f"Speedup: {legacy / vector:.1f}x")
+        print(f"Outputs identical: {identical}")
+        if not identical:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+from analyze_earth_texture import analyze_earth_texture, level_path
+from benchmark_earth_texture import make_synthetic_texture
+from region_grid import RegionGrid
+
+LEVELS = [(48, 24), (192, 96), (768, 384)]
+
+def best_of(repeats, fn):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def json_lookup(data, lat, lon):
+    """What the globe client does with earth_regions.json."""
+    width, height = data["grid_size"]["width"], data["grid_size"]["height"]
+    x = math.floor((lon + 180) / 360 * width) % width
+    y = min(math.floor((90 - lat) / 180 * height), height - 1)
+    return data["cells"][f"{x}_{y}"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare earth_regions.json with the binary region grid")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        finest_width, finest_height = LEVELS[-1]
+        image_path = os.path.join(tmp, "synthetic_earth.png")
+        make_synthetic_texture(image_path, finest_width * 2, finest_height * 2)
+        output_path = os.path.join(tmp, "earth_regions.json")
+        analyze_earth_texture(image_path, output_path, levels=LEVELS, output_format="both")
+
+        print(f"\n{'grid':>9} {'json KB':>9} {'bin KB':>8} {'json parse':>11} {'bin parse':>10} "
+              f"{'json lookup':>12} {'bin lookup':>11}")
+        for i, (width, height) in enumerate(LEVELS):
+            json_path = output_path if i == 0 else level_path(output_path, width, height)
+            bin_path = os.path.splitext(json_path)[0] + ".bin"
+
+            def parse_json():
+                with open(json_path) as f:
+                    return json.load(f)
+
+            json_parse = best_of(args.repeats, parse_json)
+            bin_parse = best_of(args.repeats, lambda: RegionGrid.load(bin_path))
+            data, grid = parse_json(), RegionGrid.load(bin_path)
+            json_lookups = best_of(1, lambda: [json_lookup(data, lat, lon) for lat, lon in points])
+            bin_lookups = best_of(1, lambda: [grid.lookup(lat, lon) for lat, lon in points])
+
+            print(f"{f'{width}x{height}':>9} {os.path.getsize(json_path) / 1024:9.1f} {os.path.getsize(bin_path) / 1024:8.1f} "
+                  f"{json_parse * 1000:9.2f}ms {bin_parse * 1000:8.2f}ms "
+                  f"{json_lookups / len(points) * 1e6:10.2f}us {bin_lookups / len(points) * 1e6:9.2f}us")
+
+if __name__ == "__main__":
+    main()
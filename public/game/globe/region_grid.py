@@ -0,0 +1,92 @@
+import json
+import math
+import struct
+
+import numpy as np
+
+# Compact binary counterpart of earth_regions.json:
+#
+#   "EREG" magic, uint32 version, uint32 header length (all little-endian)
+#   UTF-8 JSON header: {"width", "height", "features": [...], "regions": [...]}
+#   width * height cell records, row-major by grid_y then grid_x, each
+#   len(features) uint8 percentages followed by a uint8 primary feature
+#   index and a uint8 region id.
+MAGIC = b"EREG"
+VERSION = 1
+PREFIX = struct.Struct("<4sII")
+
+def write_region_grid(path, grid_width, grid_height, regions, features):
+    """
+    Write the "cells" mapping produced by build_regions() in the binary
+    format. Percentages are rounded to whole numbers.
+    """
+    region_names = sorted({cell["region"] for cell in regions.values()})
+    if len(region_names) > 255:
+        raise ValueError("Binary region format supports at most 255 region names")
+    region_ids = {name: i for i, name in enumerate(region_names)}
+    feature_ids = {name: i for i, name in enumerate(features)}
+
+    stride = len(features) + 2
+    cells = np.zeros((grid_height, grid_width, stride), dtype=np.uint8)
+    for cell in regions.values():
+        record = cells[cell["grid_y"], cell["grid_x"]]
+        for name, percentage in cell["features"].items():
+            record[feature_ids[name]] = round(percentage)
+        record[-2] = feature_ids[cell["primary_feature"]]
+        record[-1] = region_ids[cell["region"]]
+
+    header = json.dumps({"width": grid_width, "height": grid_height,
+                         "features": list(features), "regions": region_names},
+                        separators=(",", ":")).encode()
+    with open(path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(cells.tobytes())
+
+class RegionGrid:
+    """
+    Reader for the binary region format. Parsing only decodes the small
+    header; cells stay a flat uint8 view and lookups index it directly.
+    """
+    def __init__(self, data):
+        magic, version, header_length = PREFIX.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an earth region grid file")
+        header = json.loads(bytes(data[PREFIX.size:PREFIX.size + header_length]))
+        self.width = header["width"]
+        self.height = header["height"]
+        self.features = header["features"]
+        self.regions = header["regions"]
+        self.stride = len(self.features) + 2
+        start = PREFIX.size + header_length
+        size = self.width * self.height * self.stride
+        # Flat view for single lookups (cheaper than NumPy scalar indexing), array view for bulk use
+        self.records = memoryview(data)[start:start + size]
+        self.cells = np.frombuffer(self.records, dtype=np.uint8).reshape(self.height, self.width, self.stride)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def cell_index(self, lat, lon):
+        """Grid (x, y) for a coordinate, using the same mapping as the globe client."""
+        x = math.floor((lon + 180) / 360 * self.width) % self.width
+        y = min(max(math.floor((90 - lat) / 180 * self.height), 0), self.height - 1)
+        return x, y
+
+    def lookup(self, lat, lon):
+        """
+        Cell data at a coordinate: {"grid_x", "grid_y", "region",
+        "primary_feature", "features"} with only non-zero percentages.
+        """
+        x, y = self.cell_index(lat, lon)
+        offset = (y * self.width + x) * self.stride
+        record = self.records[offset:offset + self.stride].tolist()
+        return {
+            "grid_x": x,
+            "grid_y": y,
+            "region": self.regions[record[-1]],
+            "primary_feature": self.features[record[-2]],
+            "features": {name: pct for name, pct in zip(self.features, record) if pct},
+        }
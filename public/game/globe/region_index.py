@@ -0,0 +1,159 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+import numpy as np
+
+# One region rule: every bound is exclusive and None means unbounded. feature
+# is an optional (name, threshold) test on the cell's percentages. Rules are
+# checked in order and the first match wins, exactly like the old if-chain;
+# sub-regions (Alaska, Siberia, ...) carry the bounds of their parent
+# continent intersected with their own.
+RegionRule = namedtuple("RegionRule", ["region", "lon", "lat", "feature"], defaults=[(None, None), (None, None), None])
+
+NORTH_AMERICA = (-170, -30), (15, None)
+AFRICA = (-20, 55), (-35, 35)
+ASIA = (40, 150), (0, None)
+
+REGION_RULES = (
+    # Simple continental regions based on longitude/latitude
+    RegionRule("Arctic", lat=(66, None)),
+    RegionRule("Antarctica", lat=(None, -66)),
+
+    # North America
+    RegionRule("Greenland", *NORTH_AMERICA, feature=("ice", 30)),
+    RegionRule("Alaska", (-170, -140), (15, None)),
+    RegionRule("North America", (-170, -50), (15, None)),
+    RegionRule("Canada", *NORTH_AMERICA),
+
+    # South America
+    RegionRule("South America", (-90, -30), (-60, 15)),
+
+    # Europe
+    RegionRule("Europe", (-10, 40), (35, None)),
+
+    # Africa
+    RegionRule("Sahara Desert", *AFRICA, feature=("desert", 40)),
+    RegionRule("Africa", *AFRICA),
+
+    # Asia
+    RegionRule("Siberia", (60, 150), (50, None)),
+    RegionRule("China", (90, 135), (20, 40)),
+    RegionRule("India", (65, 90), (5, 35)),
+    RegionRule("Japan", (120, 150), (30, None)),
+    RegionRule("Asia", *ASIA),
+
+    # Australia
+    RegionRule("Australia", (110, 155), (-40, 0)),
+
+    # Oceans
+    RegionRule("Pacific Ocean", (150, None), (-50, 50)),
+    RegionRule("Pacific Ocean", (None, -120), (-50, 50)),
+    RegionRule("Atlantic Ocean", (-60, 0), (-50, 50)),
+    RegionRule("Indian Ocean", (40, 110), (-50, 20)),
+
+    # Default to using the primary feature as a generic region name
+    RegionRule("Ocean", feature=("ocean", 50)),
+    RegionRule("Ice Cap", feature=("ice", 30)),
+    RegionRule("Desert", feature=("desert", 40)),
+    RegionRule("Forest", feature=("vegetation", 40)),
+    RegionRule("Land"),
+)
+
+# What a coordinate cell resolves to: feature tests tried in order, then the default region
+Zone = namedtuple("Zone", ["conditions", "default"])
+
+def _inside(value, bounds):
+    low, high = bounds
+    return (low is None or value > low) and (high is None or value < high)
+
+def _interval_representatives(breaks):
+    """
+    One sample value per elementary interval of an axis. Interval 2k is the
+    open range below breaks[k], interval 2k + 1 is breaks[k] itself; since all
+    rule bounds are strict, every value in an interval matches the same rules.
+    """
+    values = []
+    for k, point in enumerate(breaks):
+        values.append(point - 1 if k == 0 else (breaks[k - 1] + point) / 2)
+        values.append(point)
+    values.append(breaks[-1] + 1)
+    return values
+
+class RegionIndex:
+    """
+    REGION_RULES compiled into a sorted interval index: each axis is split at
+    every rule bound and a (latitude interval, longitude interval) table holds
+    the zone for that box. A query is two binary searches over ~20 bounds,
+    one table read and at most a few feature comparisons.
+    """
+    def __init__(self, rules=REGION_RULES):
+        self.lat_breaks = sorted({b for rule in rules for b in rule.lat if b is not None})
+        self.lon_breaks = sorted({b for rule in rules for b in rule.lon if b is not None})
+        self.region_names = sorted({rule.region for rule in rules})
+        zone_ids = {}
+        self.table = [[zone_ids.setdefault(self._compile_zone(rules, lat, lon), len(zone_ids))
+                       for lon in _interval_representatives(self.lon_breaks)]
+                      for lat in _interval_representatives(self.lat_breaks)]
+        self.zones = list(zone_ids)
+        self.table_array = np.array(self.table, dtype=np.int32)
+
+    @staticmethod
+    def _compile_zone(rules, lat, lon):
+        conditions = []
+        for rule in rules:
+            if _inside(lon, rule.lon) and _inside(lat, rule.lat):
+                if rule.feature is None:
+                    return Zone(tuple(conditions), rule.region)
+                conditions.append(rule.feature + (rule.region,))
+        raise ValueError("REGION_RULES must end with an unconditional catch-all rule")
+
+    @staticmethod
+    def _interval(breaks, value):
+        k = bisect_left(breaks, value)
+        return 2 * k + (k < len(breaks) and breaks[k] == value)
+
+    @staticmethod
+    def _intervals(breaks, values):
+        breaks = np.asarray(breaks, dtype=np.float64)
+        k = np.searchsorted(breaks, values)
+        on_break = breaks[np.minimum(k, len(breaks) - 1)] == values
+        return 2 * k + (on_break & (k < len(breaks)))
+
+    def region_at(self, lat, lon, features=None):
+        """
+        Region name for a coordinate. features maps feature names to
+        percentages (missing ones count as 0); without it only the
+        coordinate-based regions and their non-feature fallbacks are used.
+
+        Array-like lat/lon (and feature values) are broadcast and answered in
+        bulk, returning an array of region names.
+        """
+        if np.ndim(lat) or np.ndim(lon):
+            return self.regions_at(lat, lon, features)
+        zone = self.zones[self.table[self._interval(self.lat_breaks, lat)][self._interval(self.lon_breaks, lon)]]
+        if features:
+            for feature, threshold, region in zone.conditions:
+                if features.get(feature, 0) > threshold:
+                    return region
+        return zone.default
+
+    def regions_at(self, lat, lon, features=None):
+        """Vectorized region_at(): arrays in, array of region names out."""
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+        zone_ids = self.table_array[self._intervals(self.lat_breaks, lat), self._intervals(self.lon_breaks, lon)]
+        names = np.array(self.region_names, dtype=object)
+        name_ids = {name: i for i, name in enumerate(self.region_names)}
+        result = np.array([name_ids[zone.default] for zone in self.zones])[zone_ids]
+        for zone_id, zone in enumerate(self.zones):
+            if not zone.conditions or not features:
+                continue
+            in_zone = zone_ids == zone_id
+            # Apply the tests last-to-first so the earliest matching rule wins
+            for feature, threshold, region in reversed(zone.conditions):
+                if feature in features:
+                    values = np.broadcast_to(np.asarray(features[feature]), result.shape)
+                    result[in_zone & (values > threshold)] = name_ids[region]
+        return names[result]
+
+REGION_INDEX = RegionIndex()
+region_at = REGION_INDEX.region_at
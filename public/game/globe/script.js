@@ -611,15 +611,21 @@
             // Use try-catch-finally instead of promises to handle the fetch
             const fetchRegions = () => {
                 try {
-                    // Use no-cors mode to avoid CORS errors
-                    fetch('earth_regions.json', { mode: 'same-origin', credentials: 'same-origin' })
-                        .then(response => {
-                            if (!response.ok) {
-                                throw new Error('Earth regions data not available');
-                            }
-                            return response.json();
+                    // Show the coarse level right away, then refine if the camera is zoomed in
+                    const requestId = ++regionRequestId;
+                    loadRegionLevels()
+                        .then(levels => {
+                            const target = regionLevelForZoom(levels);
+                            return loadRegionLevel(levels[0]).then(data => {
+                                if (requestId !== regionRequestId) return;
+                                processRegionData(data, lat, lng, panel);
+                                if (target > 0) {
+                                    return loadRegionLevel(levels[target]).then(fineData => {
+                                        if (requestId === regionRequestId) processRegionData(fineData, lat, lng, panel);
+                                    });
+                                }
+                            });
                         })
-                        .then(data => processRegionData(data, lat, lng, panel))
                         .catch(error => {
                             console.warn('Could not fetch region data:', error);
                             addFallbackRegionInfo(lat, lng, panel);
@@ -641,6 +647,81 @@
         panel.classList.add('visible');
     }
     
+    // Region data pyramid written by analyze_earth_texture.py --levels.
+    // Without earth_regions_levels.json we fall back to the single earth_regions.json.
+    const REGION_ZOOM_START = 2; // Camera distance of the default view, where the coarsest level is used
+    const regionLevelData = {};
+    let regionLevels = null;
+    let regionRequestId = 0;
+
+    // Decode the compact earth_regions.bin grid (see region_grid.py): "EREG", uint32 version,
+    // uint32 header length, JSON header, then per cell: feature percentages, primary feature, region id
+    function parseRegionGrid(buffer) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'EREG' || view.getUint32(4, true) !== 1) {
+            throw new Error('Unsupported earth regions grid');
+        }
+        const headerLength = view.getUint32(8, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+        const stride = header.features.length + 2;
+        const cells = new Uint8Array(buffer, 12 + headerLength);
+        return {
+            grid_size: { width: header.width, height: header.height },
+            cellAt(x, y) {
+                if (y < 0 || y >= header.height) return null;
+                const offset = (y * header.width + x) * stride;
+                const features = {};
+                header.features.forEach((name, i) => {
+                    if (cells[offset + i]) features[name] = cells[offset + i];
+                });
+                return {
+                    region: header.regions[cells[offset + stride - 1]],
+                    primary_feature: header.features[cells[offset + stride - 2]],
+                    features
+                };
+            }
+        };
+    }
+
+    function loadRegionLevel(level) {
+        const file = level.binary || level.file;
+        if (!regionLevelData[file]) {
+            // Use same-origin mode to avoid CORS errors
+            regionLevelData[file] = fetch(file, { mode: 'same-origin', credentials: 'same-origin' })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('Earth regions data not available');
+                    }
+                    return level.binary ? response.arrayBuffer().then(parseRegionGrid) : response.json();
+                })
+                .catch(error => {
+                    delete regionLevelData[file];
+                    throw error;
+                });
+        }
+        return regionLevelData[file];
+    }
+
+    function loadRegionLevels() {
+        if (!regionLevels) {
+            const singleLevel = [{ file: 'earth_regions.json' }];
+            regionLevels = fetch('earth_regions_levels.json', { mode: 'same-origin', credentials: 'same-origin' })
+                .then(response => response.ok ? response.json() : null)
+                .then(manifest => (manifest && manifest.levels && manifest.levels.length) ? manifest.levels : singleLevel)
+                .catch(() => singleLevel);
+        }
+        return regionLevels;
+    }
+
+    // Map the camera distance onto a pyramid level: default view = coarsest, fully zoomed = finest
+    function regionLevelForZoom(levels) {
+        if (!camera || !controls || levels.length === 1) return 0;
+        const distance = camera.position.distanceTo(controls.target);
+        const zoom = (REGION_ZOOM_START - distance) / (REGION_ZOOM_START - controls.minDistance);
+        return Math.min(levels.length - 1, Math.max(0, Math.round(zoom * (levels.length - 1))));
+    }
+
     // Break out the region data processing to a separate function
     function processRegionData(data, lat, lng, panel) {
         try {
@@ -654,7 +735,7 @@
             
             // Get cell data
             const cellKey = `${x}_${y}`;
-            const cellData = data.cells[cellKey];
+            const cellData = data.cellAt ? data.cellAt(x, y) : data.cells[cellKey];
             
             if (cellData) {
                 // Create or update region info elements
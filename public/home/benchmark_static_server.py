@@ -0,0 +1,131 @@
+"""
+Local load test: static_server.py's default single-threaded mode versus
+--production.
+
+    python benchmark_static_server.py --clients 16 --slow-clients 2 --duration 10
+
+Each server is started as a subprocess over a scratch directory holding a
+small page and a large media file. `clients` threads fetch the page in a
+loop while `slow-clients` threads download the media file at a throttled
+read rate, like a phone on a weak connection seeking through a video.
+Reports requests per second, p50/p99 latency and errors for the page
+requests.
+"""
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def prepare_root(media_mb):
+    root = tempfile.mkdtemp(prefix='static-bench-')
+    with open(os.path.join(root, 'index.html'), 'w') as f:
+        f.write("<!doctype html><title>bench</title>" + "<p>FarHaven</p>" * 250)
+    with open(os.path.join(root, 'media.mp4'), 'wb') as f:
+        f.write(os.urandom(media_mb * 1024 * 1024))
+    return root
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(root, production):
+    port = free_port()
+    cmd = [sys.executable, os.path.join(HERE, 'static_server.py'), str(port)] + (['--production'] if production else [])
+    proc = subprocess.Popen(cmd, cwd=root, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()   # "Serving HTTP on port ..."
+    return proc, port
+
+def slow_download(port, stop, read_rate):
+    while not stop.is_set():
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            conn.request('GET', '/media.mp4')
+            resp = conn.getresponse()
+            while not stop.is_set() and resp.read(64 * 1024):
+                time.sleep(64 * 1024 / read_rate)
+            conn.close()
+        except OSError:
+            time.sleep(0.1)
+
+def page_client(port, stop, latencies, errors, keep_alive):
+    conn = None
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            conn.request('GET', '/index.html')
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                raise OSError(f"status {resp.status}")
+            latencies.append(time.perf_counter() - start)
+            if not keep_alive or resp.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            if conn is not None:
+                conn.close()
+            conn = None
+
+def run(root, production, args):
+    proc, port = start_server(root, production)
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=slow_download, args=(port, stop, args.read_rate), daemon=True)
+               for _ in range(args.slow_clients)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)   # let the slow downloads get going first
+    clients = [threading.Thread(target=page_client, args=(port, stop, latencies, errors, production), daemon=True)
+               for _ in range(args.clients)]
+    started = time.perf_counter()
+    for t in clients:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for t in clients:
+        t.join(timeout=15)   # let in-flight requests finish before the server goes away
+    proc.terminate()
+    proc.wait()
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan'),
+        'errors': len(errors),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare static_server.py modes under concurrent load")
+    parser.add_argument("--clients", type=int, default=16, help="threads fetching the page")
+    parser.add_argument("--slow-clients", type=int, default=2, help="threads slowly downloading the media file")
+    parser.add_argument("--read-rate", type=int, default=2 * 1024 * 1024, help="slow client bytes per second")
+    parser.add_argument("--media-mb", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    root = prepare_root(args.media_mb)
+    try:
+        print(f"{args.clients} page clients, {args.slow_clients} slow media clients, {args.duration:.0f}s each")
+        for name, production in (("default (TCPServer)", False), ("--production", True)):
+            r = run(root, production, args)
+            print(f"{name:>20}: {r['rps']:8.1f} req/s  p50 {r['p50_ms']:8.1f} ms  "
+                  f"p99 {r['p99_ms']:8.1f} ms  errors {r['errors']}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
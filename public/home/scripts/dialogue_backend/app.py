@@ -1,6 +1,20 @@
-from flask import Flask, render_template, request, redirect, url_for
-import json, os, requests, time
-from gradio_client import Client, handle_file
+import time
+STARTED = time.perf_counter()   # for startup_ms in /health
+
+from flask import Flask, Response, abort, render_template, request, redirect, send_file, url_for, jsonify, stream_with_context
+import base64, json, os, requests, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from audio_store import AudioStore
+from memory_jobs import MaintenanceQueue
+from metrics import Metrics
+from memory_store import MemoryStore
+from tts_cache import AudioCache
+from context import build_context, estimate_tokens, fold_prompt
+from emotion import EmotionTagStripper, classify_emotion, emotion_instruction, emotion_settings, reply_emotion
+from tts_pipeline import join_wavs, pop_sentences, render_pipelined
+from zonos_client import VoiceRegistry, ZonosConnection
 
 app = Flask(__name__)
 
@@ -12,15 +26,68 @@ AUDIO_OUTPUT_FOLDER = 'static/audio'
 OLLAMA_URL          = "http://localhost:11434/api/chat"
 MODEL_NAME          = "gemma3:1b"
 ZONOS_URL           = "http://127.0.0.1:7860/"
-zonos_client        = Client(ZONOS_URL)
-MAX_MEMORY_ENTRIES  = 50
+zonos               = ZonosConnection(ZONOS_URL).start()   # connects in the background, reconnects with backoff
+voices              = VoiceRegistry(zonos)                 # speaker clips uploaded once per Zonos session
+TTS_CACHE_FOLDER    = 'tts_cache'
+TTS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+AUDIO_MAX_BYTES     = 256 * 1024 * 1024   # reply audio kept in AUDIO_OUTPUT_FOLDER
+AUDIO_MAX_AGE       = 7 * 24 * 3600       # seconds since a reply was last stored or played
+AUDIO_ENCODING      = 'mp3'               # see audio_store.ENCODERS; WAV is served if ffmpeg is missing
+AUDIO_BITRATE       = '48k'
+MAX_MEMORY_ENTRIES  = 50            # entries an NPC's memory may hold before it is summarized
+MEMORY_FLUSH_DELAY  = 0.5           # seconds a new memory entry may wait before it is written
+SUMMARY_KEEP        = 20            # newest entries kept verbatim when summarizing
+SUMMARY_TOKEN_BUDGET = 1500         # max tokens of new entries folded into the core belief per pass
+CONTEXT_TOKEN_BUDGET = 1024         # system prompt budget per turn (persona, belief, reflection, turns)
+CONTEXT_MAX_TURNS   = 12            # recent turns considered for the prompt context
+MAINTENANCE_WORKERS = 2             # background threads for reflection/summarization
+OLLAMA_TIMEOUT      = (3.05, 120)   # (connect, read) seconds
+OLLAMA_RETRIES      = 2             # retried on connection errors and 502/503/504
+HTTP_POOL_SIZE      = 16            # keep-alive connections to Ollama
+TTS_PIPELINE_DEPTH  = 2             # Zonos requests in flight per reply (one per sentence)
+METRICS_ENABLED     = os.environ.get('NPC_METRICS', '1') != '0'
+METRICS_MAX_NPCS    = 64            # NPC ids with their own /metrics series; the rest share npc="_other"
+TURN_LOG_PATH       = 'logs/turns.jsonl'   # one JSON line per turn/maintenance job (None to disable)
+
+def make_http_session():
+    """Shared keep-alive session with bounded retries and backoff."""
+    session = requests.Session()
+    retry = Retry(total=OLLAMA_RETRIES, backoff_factor=0.5,
+                  status_forcelist=(502, 503, 504), allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+ollama_session = make_http_session()
+
+# Per-stage latency windows for /metrics, plus a JSON line per turn
+metrics = Metrics(METRICS_ENABLED, log_path=TURN_LOG_PATH, max_npcs=METRICS_MAX_NPCS)
+
+# Zonos generation settings. A fixed seed makes output repeatable, which is what
+# lets tts_cache reuse audio for repeated lines; randomize_seed=True bypasses the cache.
+# With a known emotion, its EMOTION_PROFILES entry replaces the e1-e8 vector and pacing.
+ZONOS_SETTINGS = {
+    "model_choice": "Zyphra/Zonos-v0.1-transformer",
+    "language": "en-us",
+    "prefix_audio": None,
+    "e1": 1, "e2": 0.05, "e3": 0.05, "e4": 0.05, "e5": 0.05, "e6": 0.05, "e7": 0.1, "e8": 0.2,
+    "vq_single": 0.78, "fmax": 24000, "pitch_std": 45, "speaking_rate": 15,
+    "dnsmos_ovrl": 4, "speaker_noised": False,
+    "cfg_scale": 2, "min_p": 0.15, "seed": 420, "randomize_seed": False,
+    "unconditional_keys": ["emotion"],
+}
+tts_cache = AudioCache(TTS_CACHE_FOLDER, TTS_CACHE_MAX_BYTES)
+audio_store = AudioStore(AUDIO_OUTPUT_FOLDER, AUDIO_MAX_BYTES, AUDIO_MAX_AGE, AUDIO_ENCODING, AUDIO_BITRATE)
 
 # load/sync roster...
+ROSTER_PATH = os.path.join(DATA_FOLDER, 'npc_roster.json')
+
 def load_npc_roster():
-    roster_path = os.path.join(DATA_FOLDER, 'npc_roster.json')
     roster = {}
-    if os.path.exists(roster_path):
-        roster = json.load(open(roster_path))
+    if os.path.exists(ROSTER_PATH):
+        roster = json.load(open(ROSTER_PATH))
+    added = False
     for fn in os.listdir(VOICE_FOLDER):
         if fn.endswith('.mp3'):
             npc = fn[:-4].lower()
@@ -30,67 +97,319 @@ def load_npc_roster():
                     "base_prompt": f"You are {npc.capitalize()}, a survivor in a post-collapse world.",
                     "speaking_style": "neutral, cautious"
                 }
-    os.makedirs(DATA_FOLDER, exist_ok=True)
-    json.dump(roster, open(roster_path,'w'), indent=4)
+                added = True
+    if added or not os.path.exists(ROSTER_PATH):
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        json.dump(roster, open(ROSTER_PATH,'w'), indent=4)
     return roster
 
-NPC_ROSTER = load_npc_roster()
+def roster_signature():
+    """mtimes of the roster file and voices folder (adding/removing a voice bumps the folder)."""
+    return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None
+                 for p in (ROSTER_PATH, VOICE_FOLDER))
+
+_roster = {'signature':None, 'roster':{}}
+_roster_lock = threading.Lock()
+
+def npc_roster():
+    """The roster, reloaded only when the roster file or voices folder has changed."""
+    with _roster_lock:
+        if _roster['signature'] != roster_signature():
+            _roster['roster'] = load_npc_roster()
+            _roster['signature'] = roster_signature()   # after any rewrite by load_npc_roster
+        return _roster['roster']
+
+# Append-only log per NPC, cached in process; old <npc>_memory.json files are imported on first use
+memory_store = MemoryStore(NPC_MEMORY_FOLDER, flush_delay=MEMORY_FLUSH_DELAY)
 
 def load_memory(npc_id):
-    path = os.path.join(NPC_MEMORY_FOLDER, f"{npc_id}_memory.json")
-    if os.path.exists(path):
-        return json.load(open(path))
-    os.makedirs(NPC_MEMORY_FOLDER, exist_ok=True)
-    json.dump([], open(path,'w'))
-    return []
+    return memory_store.load(npc_id)
 
 def save_memory(npc_id, memory):
-    path = os.path.join(NPC_MEMORY_FOLDER, f"{npc_id}_memory.json")
-    json.dump(memory, open(path,'w'), indent=4)
+    memory_store.replace(npc_id, memory)
 
-def pulse_ollama(user_input, system_prompt=None):
-    payload = {"model":MODEL_NAME, "messages":[], "stream":False}
+def memory_lock(npc_id):
+    """Per-NPC lock to hold around every load-modify-save of a memory file."""
+    return memory_store.lock(npc_id)
+
+def get_npc_data(npc_id):
+    return npc_roster().get(npc_id, {
+        "display_name": npc_id.capitalize(),
+        "base_prompt": f"You are {npc_id.capitalize()}, a survivor.",
+        "speaking_style":"neutral, functional"
+    })
+
+def ollama_payload(user_input, system_prompt=None, stream=False):
+    payload = {"model":MODEL_NAME, "messages":[], "stream":stream}
     if system_prompt:
         payload["messages"].append({"role":"system","content":system_prompt})
     payload["messages"].append({"role":"user","content":user_input})
+    return payload
+
+def pulse_ollama(user_input, system_prompt=None):
+    payload = ollama_payload(user_input, system_prompt)
     try:
-        r = requests.post(OLLAMA_URL, json=payload)
+        r = ollama_session.post(OLLAMA_URL, json=payload, timeout=OLLAMA_TIMEOUT)
         r.raise_for_status()
         return r.json().get('message',{}).get('content','[No response]')
     except Exception as e:
+        metrics.error('ollama', None, e)
         return f"Error: {e}"
 
-def synthesize_zonos(text, npc_id):
+def stream_ollama(user_input, system_prompt=None):
+    """Like pulse_ollama(), but yields the reply in pieces as Ollama generates them."""
+    payload = ollama_payload(user_input, system_prompt, stream=True)
+    try:
+        with ollama_session.post(OLLAMA_URL, json=payload, timeout=OLLAMA_TIMEOUT, stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                part = json.loads(line)
+                content = part.get('message',{}).get('content','')
+                if content:
+                    yield content
+                if part.get('done'):
+                    break
+    except Exception as e:
+        metrics.error('ollama', None, e)
+        yield f"Error: {e}"
+
+def synthesize_zonos(text, npc_id, emotion=None):
     if not text.strip(): return None
     sp = os.path.join(VOICE_FOLDER, f"{npc_id}.mp3")
     if not os.path.exists(sp):
         sp = os.path.join(VOICE_FOLDER, "robot.mp3")
+    settings = emotion_settings(ZONOS_SETTINGS, emotion) if emotion else ZONOS_SETTINGS
+    key = tts_cache.key_for(text, sp, settings)   # the profile is part of the key
+    cached = key and tts_cache.fetch(key)
+    if cached:
+        return cached
     try:
-        out = zonos_client.predict(
-            model_choice="Zyphra/Zonos-v0.1-transformer",
-            text=text,
-            language="en-us",
-            speaker_audio=handle_file(sp),
-            prefix_audio=None,
-            e1=1,e2=0.05,e3=0.05,e4=0.05,e5=0.05,e6=0.05,e7=0.1,e8=0.2,
-            vq_single=0.78,fmax=24000,pitch_std=45,speaking_rate=15,
-            dnsmos_ovrl=4,speaker_noised=False,
-            cfg_scale=2,min_p=0.15,seed=420,randomize_seed=True,
-            unconditional_keys=["emotion"],
-            api_name="/generate_audio"
-        )
+        with metrics.stage('zonos_call', npc_id):
+            out = voices.predict(
+                sp,
+                text=text,
+                api_name="/generate_audio",
+                **settings
+            )
+        if key and out[0] and os.path.exists(out[0]):
+            tts_cache.store(key, out[0])
         return out[0]
     except Exception as e:
         print("TTS failed:", e)
         return None
 
+def synthesize_chunk(sentence, npc_id, emotion=None):
+    """synthesize_zonos() for one sentence of a reply, retried once before giving up."""
+    path = synthesize_zonos(sentence, npc_id, emotion)
+    if not path:
+        print(f"TTS failed for {npc_id}, retrying once: {sentence!r}")
+        path = synthesize_zonos(sentence, npc_id, emotion)
+    if not path:
+        metrics.error('tts_chunk', npc_id, "failed after a retry")
+    return path
+
+def synthesize_reply(text, npc_id, emotion=None):
+    """
+    Render a reply sentence by sentence (TTS_PIPELINE_DEPTH at a time) and
+    join the chunks into one WAV, spoken with emotion's profile; returns (temp path or None,
+    first_audio_ms, failed chunks). If a sentence fails even after a retry
+    there is no audio at all, rather than a reply missing a sentence.
+    """
+    started = time.time()
+    chunks, first_audio_ms, failed = [], None, 0
+    for index, sentence, path in render_pipelined(text, lambda s: synthesize_chunk(s, npc_id, emotion), TTS_PIPELINE_DEPTH):
+        if not path:
+            print(f"TTS chunk {index} failed for {npc_id}: {sentence!r}")
+            failed += 1
+            continue
+        if first_audio_ms is None:
+            first_audio_ms = round((time.time() - started) * 1000)
+            metrics.observe('tts_first_audio', npc_id, first_audio_ms)
+        chunks.append(path)
+    if failed:
+        for path in chunks:
+            os.remove(path)
+        return None, None, failed
+    if len(chunks) <= 1:
+        return (chunks[0] if chunks else None), first_audio_ms, 0
+    fd, joined = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    with metrics.stage('tts_join', npc_id):
+        ok = join_wavs(chunks, joined)
+    for path in chunks:
+        os.remove(path)
+    if not ok:
+        os.remove(joined)
+        return synthesize_zonos(text, npc_id, emotion), first_audio_ms, 0
+    return joined, first_audio_ms, 0
+
+def needs_summary(entries):
+    """Whether a memory holding `entries` entries is due for summarization (record_turn and summarize_memory agree on this)."""
+    return entries > MAX_MEMORY_ENTRIES
+
 def summarize_memory(npc_id, memory):
-    if len(memory) <= MAX_MEMORY_ENTRIES:
-        return memory
-    old = memory[:-20]
-    parts = [f"Player: {e['user']} {npc_id.capitalize()}: {e['ai']}" for e in old if 'user' in e]
-    core = pulse_ollama("Summarize into a core belief: " + "; ".join(parts))
-    return [{'reflection':core,'type':'core-belief'}] + memory[-20:]
+    """
+    Fold entries older than the newest SUMMARY_KEEP into the core belief
+    (kept as the first entry). Only the entries since the last summary are
+    sent, up to SUMMARY_TOKEN_BUDGET; anything left over is folded on the
+    next pass. Returns (new memory, entries covered), or None.
+    """
+    if not needs_summary(len(memory)):
+        return None
+    old = memory[:-SUMMARY_KEEP]
+    previous, start = None, 0
+    if old[0].get('type') == 'core-belief':
+        previous, start = old[0]['reflection'], 1
+    prompt, folded = fold_prompt(previous, old[start:], get_npc_data(npc_id)['display_name'], SUMMARY_TOKEN_BUDGET)
+    core = pulse_ollama(prompt)
+    if core.startswith("Error:"):
+        print(f"Summary for {npc_id} failed: {core}")
+        return None
+    covered = start + folded
+    print(f"Folded {folded} entries into {npc_id}'s core belief ({estimate_tokens(prompt)} prompt tokens)")
+    return [{'reflection':core,'type':'core-belief'}] + memory[covered:], covered
+
+def maintain_memory(npc_id, tasks):
+    """
+    Background job: reflect on the last five turns and/or fold old entries
+    into a core belief. LLM calls run without the memory lock; results are
+    merged into whatever the file holds by then, so turns saved meanwhile
+    are kept. A summary is dropped if the entries it covered were already
+    rewritten by someone else.
+    """
+    npc_data = get_npc_data(npc_id)
+    trace = metrics.trace(npc_id, 'maintenance')
+    try:
+        if 'reflect' in tasks:
+            with trace.stage('reflect'):
+                last5 = memory_store.tail(npc_id, 5, where=lambda e: 'user' in e)
+                ref = pulse_ollama(
+                    "Reflect poetically: " +
+                    "; ".join(f"Player: {e['user']} {npc_data['display_name']}: {e['ai']}" for e in last5)
+                )
+                memory_store.append(npc_id, {'reflection':ref,'type':'reflection'})
+
+        if 'summarize' in tasks:
+            snapshot = load_memory(npc_id)
+            with trace.stage('summarize_memory'):
+                folded = summarize_memory(npc_id, snapshot)
+            if folded is None:
+                return
+            summarized, covered = folded
+            with memory_lock(npc_id), trace.stage('save_memory'):
+                memory = load_memory(npc_id)
+                if memory[:covered] != snapshot[:covered]:
+                    print(f"Discarding stale summary for {npc_id}: memory was rewritten")
+                    return
+                save_memory(npc_id, summarized[:1] + memory[covered:])
+    finally:
+        trace.finish(tasks=sorted(tasks))
+
+maintenance = MaintenanceQueue(maintain_memory, workers=MAINTENANCE_WORKERS)
+
+def build_prompt(npc_id, npc_data, ui):
+    """
+    System prompt for a turn: persona, core belief, latest reflection and as
+    many recent turns as fit in CONTEXT_TOKEN_BUDGET. Returns (prompt,
+    report); report['prompt_tokens'] also counts the player's message.
+    """
+    prompt, report = build_context(
+        npc_data,
+        memory_store.tail(npc_id, CONTEXT_MAX_TURNS, where=lambda e: 'user' in e),
+        core=next(iter(memory_store.tail(npc_id, 1, where=lambda e: e.get('type') == 'core-belief')), None),
+        reflection=next(iter(memory_store.tail(npc_id, 1, where=lambda e: e.get('type') == 'reflection')), None),
+        budget=CONTEXT_TOKEN_BUDGET,
+        instruction=emotion_instruction(),
+    )
+    report['prompt_tokens'] = report['system_tokens'] + estimate_tokens(ui)
+    print(f"Prompt for {npc_id}: {report['prompt_tokens']} tokens, {report['turns']}/{report['turns_available']} turns")
+    return prompt, report
+
+def store_audio(tmp, encode=True):
+    """Move a synthesized WAV into audio_store; returns its key, or None if there was none."""
+    return audio_store.put(tmp, encode)
+
+def join_audio(keys):
+    """Join per-sentence clips (stored with encode=False) into one stored reply; returns its key or None."""
+    paths = [audio_store.path(k, wav=True) for k in keys]
+    if not paths or None in paths:
+        return None
+    fd, tmp = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    if join_wavs(paths, tmp):
+        return store_audio(tmp)
+    os.remove(tmp)
+    return None
+
+def audio_url(key):
+    return url_for('audio_file', key=key) if key else None
+
+def record_turn(npc_id, ui, ai, emo):
+    """Append a finished turn to memory and queue any maintenance it triggers."""
+    counts = memory_store.append(npc_id, {'user':ui, 'ai':ai, 'emotion':emo, 'likes':0})
+
+    # Reflection and summarization happen off the request path
+    if counts['turns'] % 5 == 0:
+        maintenance.submit(npc_id, 'reflect')
+    if needs_summary(counts['entries']):
+        maintenance.submit(npc_id, 'summarize')
+    return counts
+
+def run_turn(npc_id, ui):
+    """
+    One complete turn: the reply (which carries its own emotion tag), then
+    TTS. Returns {'reply', 'emotion', 'audio' (audio_store key or None),
+    'first_audio_ms', 'prompt_tokens', 'tts_failures' (sentences that never
+    rendered, in which case there is no audio)}.
+    """
+    trace = metrics.trace(npc_id, 'turn')
+    with trace.stage('context'):
+        npc_data = get_npc_data(npc_id)
+        prompt, report = build_prompt(npc_id, npc_data, ui)
+    with trace.stage('llm_reply'):
+        raw = pulse_ollama(ui, prompt)
+    if raw.startswith("Error:"):
+        trace.error('llm_reply', raw)
+    with trace.stage('emotion'):
+        emo, ai = reply_emotion(raw)
+
+    with trace.stage('tts'):
+        tmp, first_audio_ms, tts_failures = synthesize_reply(ai, npc_id, emo)
+    if tmp is None:
+        trace.error('tts', "no audio")
+    with trace.stage('store_audio'):
+        key = store_audio(tmp)
+    print(f"TTS for {npc_id}: first audio after {first_audio_ms} ms")
+
+    with trace.stage('record_turn'):
+        record_turn(npc_id, ui, ai, emo)
+    trace.finish(prompt_tokens=report['prompt_tokens'], first_audio_ms=first_audio_ms, emotion=emo,
+                 tts_failures=tts_failures)
+    return {'reply':ai, 'emotion':emo, 'audio':key,
+            'first_audio_ms':first_audio_ms, 'prompt_tokens':report['prompt_tokens'], 'tts_failures':tts_failures}
+
+def turn_response(npc_id, turn, audio_url, include_audio=False):
+    """JSON body for /npc/<npc_id>/turn, optionally with the audio inlined as base64 (audio_format is its extension)."""
+    result = {'npc_id':npc_id, 'reply':turn['reply'], 'emotion':turn['emotion'],
+              'audio_url':audio_url, 'first_audio_ms':turn['first_audio_ms'],
+              'prompt_tokens':turn['prompt_tokens'], 'tts_failures':turn['tts_failures']}
+    path = turn['audio'] and include_audio and audio_store.path(turn['audio'])
+    if path:
+        with open(path, 'rb') as f:
+            result['audio_base64'] = base64.b64encode(f.read()).decode()
+        result['audio_format'] = os.path.splitext(path)[1][1:]
+    return result
+
+def parse_flag(value):
+    """A JSON boolean or a form value ("1", "true", "yes", "on") as a bool; "0", "false" and missing are False."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.route('/', methods=['GET','POST'])
 def home():
@@ -98,7 +417,7 @@ def home():
         sel = request.form.get('npc_selector')
         if sel:
             return redirect(url_for('npc_interaction', npc_id=sel))
-    return render_template('home.html', npc_roster=NPC_ROSTER)
+    return render_template('home.html', npc_roster=npc_roster())
 
 @app.route('/npc/<npc_id>', methods=['GET','POST'])
 def npc_interaction(npc_id):
@@ -106,69 +425,166 @@ def npc_interaction(npc_id):
     sel = request.form.get('npc_selector', npc_id)
     npc_id = sel
 
-    memory   = load_memory(npc_id)
-    npc_data = NPC_ROSTER.get(npc_id, {
-        "display_name": npc_id.capitalize(),
-        "base_prompt": f"You are {npc_id.capitalize()}, a survivor.",
-        "speaking_style":"neutral, functional"
-    })
+    npc_data = get_npc_data(npc_id)
 
     audio_file = request.args.get('audio')  # get from query string
 
     if request.method=='POST' and request.form.get('user_input'):
-        ui = request.form['user_input']
-        # build context
-        ctx = ""
-        for e in memory[-3:]:
-            if 'user' in e:
-                ctx += f"Player: {e['user']}\n{npc_data['display_name']}: {e['ai']}\n"
-
-        prompt = (
-            f"{npc_data['base_prompt']}\n"
-            f"Speaking Style: {npc_data['speaking_style']}\n"
-            f"Context:\n{ctx}\n"
-            "Respond in 2–4 sentences."
-        )
-        ai = pulse_ollama(ui, prompt)
-        emo = pulse_ollama(f"Classify emotion: Player: {ui} | {npc_data['display_name']}: {ai}")
-
-        stamp = time.strftime("%d%H%M", time.localtime())
-        filename = f"{npc_id}_{stamp}.wav"
-        outpath = os.path.join(AUDIO_OUTPUT_FOLDER, filename)
-
-        tmp = synthesize_zonos(ai, npc_id)
-        if tmp and os.path.exists(tmp):
-            os.makedirs(AUDIO_OUTPUT_FOLDER, exist_ok=True)
-            os.replace(tmp, outpath)
-
-        memory.append({'user':ui, 'ai':ai, 'emotion':emo, 'likes':0})
-        if sum(1 for e in memory if 'user' in e) % 5 == 0:
-            last5 = [e for e in memory if 'user' in e][-5:]
-            ref = pulse_ollama(
-                "Reflect poetically: " +
-                "; ".join(f"Player: {e['user']} {npc_data['display_name']}: {e['ai']}" for e in last5)
-            )
-            memory.append({'reflection':ref,'type':'reflection'})
-
-        memory = summarize_memory(npc_id, memory)
-        save_memory(npc_id, memory)
+        key = run_turn(npc_id, request.form['user_input'])['audio']
 
-        # Redirect with audio filename in query
+        # Redirect with the audio key in query
         return redirect(url_for('npc_interaction',
                                 npc_id=npc_id,
-                                audio=filename))
+                                audio=key))
 
     return render_template('npc.html',
-        memory=memory,
+        memory=load_memory(npc_id),
         npc_id=npc_id,
         npc_data=npc_data,
-        npc_roster=NPC_ROSTER,
-        audio_filename=audio_file
+        npc_roster=npc_roster(),
+        audio_url=audio_url(audio_file)
     )
 
 @app.route('/npc/<npc_id>/memory')
 def npc_memory_api(npc_id):
-    return load_memory(npc_id)
+    # Pollers send If-None-Match and get a 304 until the memory changes
+    tag, memory = memory_store.snapshot(npc_id)
+    if tag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = jsonify(memory)
+    resp.set_etag(tag)
+    return resp
+
+@app.route('/npc/<npc_id>/turn', methods=['POST'])
+def npc_turn(npc_id):
+    """
+    Single round trip for voice clients: takes user_input (JSON or form) and
+    returns the reply, emotion and audio_url of the rendered speech. With
+    include_audio set, the audio itself comes back as audio_base64.
+    """
+    data = request.get_json(silent=True) or request.form
+    ui = (data.get('user_input') or '').strip()
+    if not ui:
+        return jsonify({'error':'user_input is required'}), 400
+    turn = run_turn(npc_id, ui)
+    return jsonify(turn_response(npc_id, turn, audio_url(turn['audio']), parse_flag(data.get('include_audio'))))
+
+@app.route('/npc/<npc_id>/stream', methods=['GET','POST'])
+def npc_stream(npc_id):
+    """
+    Server-Sent Events version of a POST to /npc/<npc_id>. Emits `token`
+    events as the reply is generated, an `audio` event per sentence (in
+    order) as soon as its TTS is rendered, then `done` with the reply,
+    emotion, time-to-first-text/audio and audio_url of the joined reply. At
+    most TTS_PIPELINE_DEPTH sentences render at once. The memory entry
+    written at the end is the same as for the form POST.
+    """
+    ui = request.values.get('user_input', '').strip()
+    if not ui:
+        return jsonify({'error':'user_input is required'}), 400
+    trace = metrics.trace(npc_id, 'stream')
+    with trace.stage('context'):
+        npc_data = get_npc_data(npc_id)
+        prompt, report = build_prompt(npc_id, npc_data, ui)
+
+    def synthesize_sentence(index, sentence, emotion):
+        # Kept as WAV: clients play it immediately and join_audio needs it
+        return store_audio(synthesize_chunk(sentence, npc_id, emotion), encode=False)
+
+    def generate():
+        started = time.time()
+        timings = {'prompt_tokens':report['prompt_tokens']}
+        reply, pending = "", ""
+        tts_pool = ThreadPoolExecutor(max_workers=TTS_PIPELINE_DEPTH, thread_name_prefix='tts-pipeline')
+        tts_jobs, sent, audio_keys = [], 0, []
+        tagger = EmotionTagStripper()
+
+        def audio_events(block):
+            nonlocal sent
+            while sent < len(tts_jobs) and (block or tts_jobs[sent].done()):
+                key = tts_jobs[sent].result()
+                if key:
+                    audio_keys.append(key)
+                    timings.setdefault('first_audio_ms', round((time.time() - started) * 1000))
+                    yield sse('audio', {'index':sent, 'url':audio_url(key)})
+                else:
+                    timings['tts_failures'] = timings.get('tts_failures', 0) + 1
+                sent += 1
+
+        with trace.stage('llm_stream'):
+            for chunk in tagger.strip(stream_ollama(ui, prompt)):
+                timings.setdefault('first_text_ms', round((time.time() - started) * 1000))
+                reply += chunk
+                pending += chunk
+                yield sse('token', {'text':chunk})
+                sentences, pending = pop_sentences(pending)
+                for sentence in sentences:
+                    tts_jobs.append(tts_pool.submit(synthesize_sentence, len(tts_jobs), sentence, tagger.label))
+                yield from audio_events(block=False)
+        if pending.strip():
+            tts_jobs.append(tts_pool.submit(synthesize_sentence, len(tts_jobs), pending.strip(), tagger.label))
+
+        reply = reply.strip()
+        with trace.stage('emotion'):
+            emo = tagger.label or classify_emotion(reply)
+        with trace.stage('tts_drain'):
+            yield from audio_events(block=True)
+        tts_pool.shutdown()
+        with trace.stage('join_audio'):
+            # A sentence that never rendered would leave a hole; send no joined audio instead
+            joined = None if timings.get('tts_failures') else join_audio(audio_keys)
+        with trace.stage('record_turn'):
+            record_turn(npc_id, ui, reply, emo)
+        print(f"Streamed turn for {npc_id}: {timings}")
+        trace.finish(emotion=emo, **timings)
+        yield sse('done', {'reply':reply, 'emotion':emo, **timings,
+                           'audio_url':audio_url(joined)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control':'no-cache', 'X-Accel-Buffering':'no'})
+
+@app.route('/tts/cache')
+def tts_cache_status():
+    return jsonify({**tts_cache.stats(), 'voices':voices.stats()})
+
+@app.route('/audio/<key>')
+def audio_file(key):
+    """A stored reply, encoded once the background encoder has caught up. Keys are content hashes."""
+    path = audio_store.path(key)
+    if not path:
+        abort(404)
+    # A WAV may be replaced by its encoded version soon, so browsers shouldn't keep it long
+    max_age = 60 if path.endswith('.wav') and audio_store.encoding else AUDIO_MAX_AGE
+    resp = send_file(os.path.abspath(path), conditional=True, max_age=max_age)   # relative paths are taken from app.root_path
+    if resp.status_code in (200, 206):
+        audio_store.served(resp.content_length or 0)
+    return resp
+
+@app.route('/audio/status')
+def audio_status():
+    return jsonify(audio_store.stats())
+
+@app.route('/maintenance/status')
+def maintenance_status():
+    return jsonify(maintenance.status())
+
+def health_status():
+    """Liveness plus startup time and Zonos state; TTS being down doesn't make the backend unhealthy."""
+    return {'status':'ok', 'startup_ms':STARTUP_MS, 'uptime_s':round(time.perf_counter() - STARTED),
+            'zonos':zonos.status()}
+
+@app.route('/health')
+def health():
+    return jsonify(health_status())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text format: per-stage latency quantiles and error counts."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+STARTUP_MS = round((time.perf_counter() - STARTED) * 1000)
+print(f"Dialogue backend loaded in {STARTUP_MS} ms")
 
 if __name__=='__main__':
     app.run(debug=True)
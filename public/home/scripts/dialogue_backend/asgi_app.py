@@ -0,0 +1,274 @@
+"""
+Async (ASGI) serving mode for the dialogue backend.
+
+Serves the same routes as app.py, but a player waiting on Ollama no
+longer ties up a worker thread: Ollama is called with an async HTTP client.
+The blocking Zonos client runs on its own thread pool (TTS_WORKERS), and
+memory-store and audio file I/O on a separate one (BLOCKING_WORKERS), so
+slow TTS can't hold up the short calls every turn makes. Each NPC handles
+at most NPC_CONCURRENCY turns at once (the rest wait their turn). Memory,
+roster, TTS cache and prompt building are shared with app.py.
+
+    hypercorn asgi_app:app --bind 0.0.0.0:5000
+"""
+import asyncio, json, time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from quart import Quart, Response, abort, render_template, request, redirect, send_file, url_for, jsonify, stream_with_context
+
+import app as backend
+from emotion import EmotionTagStripper, classify_emotion, reply_emotion
+
+app = Quart(__name__)
+
+NPC_CONCURRENCY = 4   # turns processed at once per NPC
+BLOCKING_WORKERS = 8  # threads for short blocking calls (memory store, audio files) made from request handlers
+TTS_WORKERS = 16      # replies rendering at once, each with up to TTS_PIPELINE_DEPTH Zonos calls in flight;
+                      # size to the Zonos server's capacity. A turn waiting for a slot costs no thread.
+
+ollama = None
+npc_slots = defaultdict(lambda: asyncio.Semaphore(NPC_CONCURRENCY))
+blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix='asgi-blocking')
+tts_pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix='asgi-tts')   # long Zonos calls only
+
+@app.before_serving
+async def open_clients():
+    global ollama
+    connect, read = backend.OLLAMA_TIMEOUT
+    ollama = httpx.AsyncClient(
+        timeout=httpx.Timeout(read, connect=connect),
+        limits=httpx.Limits(max_connections=backend.HTTP_POOL_SIZE,
+                            max_keepalive_connections=backend.HTTP_POOL_SIZE),
+        transport=httpx.AsyncHTTPTransport(retries=backend.OLLAMA_RETRIES),
+    )
+
+@app.after_serving
+async def close_clients():
+    await ollama.aclose()
+    backend.memory_store.flush()
+
+def run_blocking(fn, *args):
+    """Run a short blocking call (memory store, file I/O) on blocking_pool."""
+    return asyncio.get_running_loop().run_in_executor(blocking_pool, fn, *args)
+
+def run_tts(fn, *args):
+    """Run a Zonos call on tts_pool, so slow TTS can't starve the memory and file I/O in blocking_pool."""
+    return asyncio.get_running_loop().run_in_executor(tts_pool, fn, *args)
+
+async def pulse_ollama(user_input, system_prompt=None):
+    try:
+        r = await ollama.post(backend.OLLAMA_URL, json=backend.ollama_payload(user_input, system_prompt))
+        r.raise_for_status()
+        return r.json().get('message',{}).get('content','[No response]')
+    except Exception as e:
+        backend.metrics.error('ollama', None, e)
+        return f"Error: {e}"
+
+async def stream_ollama(user_input, system_prompt=None):
+    payload = backend.ollama_payload(user_input, system_prompt, stream=True)
+    try:
+        async with ollama.stream('POST', backend.OLLAMA_URL, json=payload) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                part = json.loads(line)
+                content = part.get('message',{}).get('content','')
+                if content:
+                    yield content
+                if part.get('done'):
+                    break
+    except Exception as e:
+        backend.metrics.error('ollama', None, e)
+        yield f"Error: {e}"
+
+async def run_turn(npc_id, ui):
+    """Async counterpart of app.run_turn(); returns the same dict."""
+    trace = backend.metrics.trace(npc_id, 'turn')
+    npc_data = await run_blocking(backend.get_npc_data, npc_id)
+    with trace.stage('npc_slot_wait'):
+        await npc_slots[npc_id].acquire()
+    try:
+        with trace.stage('context'):
+            prompt, report = await run_blocking(backend.build_prompt, npc_id, npc_data, ui)
+        with trace.stage('llm_reply'):
+            raw = await pulse_ollama(ui, prompt)
+        if raw.startswith("Error:"):
+            trace.error('llm_reply', raw)
+        with trace.stage('emotion'):
+            emo, ai = reply_emotion(raw)
+
+        with trace.stage('tts'):
+            tmp, first_audio_ms, tts_failures = await run_tts(backend.synthesize_reply, ai, npc_id, emo)
+        if tmp is None:
+            trace.error('tts', "no audio")
+        with trace.stage('store_audio'):
+            key = await run_blocking(backend.store_audio, tmp)
+        with trace.stage('record_turn'):
+            await run_blocking(backend.record_turn, npc_id, ui, ai, emo)
+    finally:
+        npc_slots[npc_id].release()
+    trace.finish(prompt_tokens=report['prompt_tokens'], first_audio_ms=first_audio_ms, emotion=emo,
+                 tts_failures=tts_failures)
+    return {'reply':ai, 'emotion':emo, 'audio':key,
+            'first_audio_ms':first_audio_ms, 'prompt_tokens':report['prompt_tokens'], 'tts_failures':tts_failures}
+
+def audio_url(key):
+    return url_for('audio_file', key=key) if key else None
+
+@app.route('/', methods=['GET','POST'])
+async def home():
+    if request.method=='POST':
+        sel = (await request.form).get('npc_selector')
+        if sel:
+            return redirect(url_for('npc_interaction', npc_id=sel))
+    return await render_template('home.html', npc_roster=await run_blocking(backend.npc_roster))
+
+@app.route('/npc/<npc_id>', methods=['GET','POST'])
+async def npc_interaction(npc_id):
+    form = await request.form
+    npc_id = form.get('npc_selector', npc_id)
+    npc_data = await run_blocking(backend.get_npc_data, npc_id)
+
+    audio_file = request.args.get('audio')
+
+    if request.method=='POST' and form.get('user_input'):
+        key = (await run_turn(npc_id, form['user_input']))['audio']
+        return redirect(url_for('npc_interaction', npc_id=npc_id, audio=key))
+
+    return await render_template('npc.html',
+        memory=await run_blocking(backend.load_memory, npc_id),
+        npc_id=npc_id,
+        npc_data=npc_data,
+        npc_roster=await run_blocking(backend.npc_roster),
+        audio_url=audio_url(audio_file)
+    )
+
+@app.route('/npc/<npc_id>/memory')
+async def npc_memory_api(npc_id):
+    tag, memory = await run_blocking(backend.memory_store.snapshot, npc_id)
+    if tag in request.if_none_match:
+        resp = Response('', status=304)
+    else:
+        resp = jsonify(memory)
+    resp.set_etag(tag)
+    return resp
+
+@app.route('/npc/<npc_id>/turn', methods=['POST'])
+async def npc_turn(npc_id):
+    """Async counterpart of app.npc_turn()."""
+    data = await request.get_json(silent=True) or await request.form
+    ui = (data.get('user_input') or '').strip()
+    if not ui:
+        return jsonify({'error':'user_input is required'}), 400
+    turn = await run_turn(npc_id, ui)
+    return jsonify(await run_blocking(backend.turn_response, npc_id, turn, audio_url(turn['audio']), backend.parse_flag(data.get('include_audio'))))
+
+@app.route('/npc/<npc_id>/stream', methods=['GET','POST'])
+async def npc_stream(npc_id):
+    """Async counterpart of app.npc_stream(); emits the same SSE events."""
+    ui = (await request.values).get('user_input', '').strip()
+    if not ui:
+        return jsonify({'error':'user_input is required'}), 400
+    npc_data = await run_blocking(backend.get_npc_data, npc_id)
+
+    def synthesize_sentence(index, sentence, emotion):
+        return backend.store_audio(backend.synthesize_chunk(sentence, npc_id, emotion), encode=False)
+
+    @stream_with_context
+    async def generate():
+        trace = backend.metrics.trace(npc_id, 'stream')
+        with trace.stage('npc_slot_wait'):
+            await npc_slots[npc_id].acquire()
+        try:
+            with trace.stage('context'):
+                prompt, report = await run_blocking(backend.build_prompt, npc_id, npc_data, ui)
+            started = time.time()
+            timings = {'prompt_tokens':report['prompt_tokens']}
+            reply, pending = "", ""
+            sentence_pool = ThreadPoolExecutor(max_workers=backend.TTS_PIPELINE_DEPTH, thread_name_prefix='tts-pipeline')
+            loop = asyncio.get_running_loop()
+            tts_jobs, sent, audio_keys = [], 0, []
+            tagger = EmotionTagStripper()
+
+            async def audio_events(block):
+                nonlocal sent
+                while sent < len(tts_jobs) and (block or tts_jobs[sent].done()):
+                    key = await tts_jobs[sent]
+                    if key:
+                        audio_keys.append(key)
+                        timings.setdefault('first_audio_ms', round((time.time() - started) * 1000))
+                        yield backend.sse('audio', {'index':sent, 'url':audio_url(key)})
+                    else:
+                        timings['tts_failures'] = timings.get('tts_failures', 0) + 1
+                    sent += 1
+
+            with trace.stage('llm_stream'):
+                async for chunk in tagger.astrip(stream_ollama(ui, prompt)):
+                    timings.setdefault('first_text_ms', round((time.time() - started) * 1000))
+                    reply += chunk
+                    pending += chunk
+                    yield backend.sse('token', {'text':chunk})
+                    sentences, pending = backend.pop_sentences(pending)
+                    for sentence in sentences:
+                        tts_jobs.append(loop.run_in_executor(sentence_pool, synthesize_sentence, len(tts_jobs), sentence, tagger.label))
+                    async for event in audio_events(block=False):
+                        yield event
+            if pending.strip():
+                tts_jobs.append(loop.run_in_executor(sentence_pool, synthesize_sentence, len(tts_jobs), pending.strip(), tagger.label))
+
+            reply = reply.strip()
+            with trace.stage('emotion'):
+                emo = tagger.label or classify_emotion(reply)
+            with trace.stage('tts_drain'):
+                async for event in audio_events(block=True):
+                    yield event
+            sentence_pool.shutdown(wait=False)
+            with trace.stage('join_audio'):
+                joined = None if timings.get('tts_failures') else await run_blocking(backend.join_audio, audio_keys)
+            with trace.stage('record_turn'):
+                await run_blocking(backend.record_turn, npc_id, ui, reply, emo)
+            trace.finish(emotion=emo, **timings)
+            yield backend.sse('done', {'reply':reply, 'emotion':emo, **timings,
+                                       'audio_url':audio_url(joined)})
+        finally:
+            npc_slots[npc_id].release()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control':'no-cache', 'X-Accel-Buffering':'no'})
+
+@app.route('/tts/cache')
+async def tts_cache_status():
+    return jsonify({**backend.tts_cache.stats(), 'voices':backend.voices.stats()})
+
+@app.route('/audio/<key>')
+async def audio_file(key):
+    path = await run_blocking(backend.audio_store.path, key)   # touches file mtimes
+    if not path:
+        abort(404)
+    max_age = 60 if path.endswith('.wav') and backend.audio_store.encoding else backend.AUDIO_MAX_AGE
+    resp = await send_file(path, conditional=True, cache_timeout=max_age)
+    if resp.status_code in (200, 206):
+        backend.audio_store.served(resp.content_length or 0)
+    return resp
+
+@app.route('/audio/status')
+async def audio_status():
+    return jsonify(backend.audio_store.stats())
+
+@app.route('/maintenance/status')
+async def maintenance_status():
+    return jsonify(backend.maintenance.status())
+
+@app.route('/health')
+async def health():
+    return jsonify(backend.health_status())
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    return Response(backend.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+if __name__=='__main__':
+    app.run()
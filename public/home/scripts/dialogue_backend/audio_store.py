@@ -0,0 +1,199 @@
+import hashlib, os, queue, re, shutil, subprocess, threading, time
+from collections import OrderedDict
+
+KEY = re.compile(r'[0-9a-f]{20}')
+
+# ffmpeg output arguments per encoding; mono speech at a low bitrate
+ENCODERS = {
+    'mp3': ['-ac', '1', '-codec:a', 'libmp3lame', '-b:a', '{bitrate}', '-f', 'mp3'],
+    'ogg': ['-ac', '1', '-codec:a', 'libopus', '-b:a', '{bitrate}', '-f', 'ogg'],   # smaller; Safari < 17 can't play it
+}
+
+class AudioStore:
+    """
+    Rendered replies served to players, named by a hash of the WAV's
+    content, so a repeated line is stored (and cached by browsers) once.
+
+    put() moves a WAV in and returns its key at once; a background worker
+    then encodes it (ENCODERS[encoding] through ffmpeg) and deletes the WAV
+    unless it was stored with encode=False (per-sentence clips, which the
+    stream joins afterwards). Without ffmpeg, or if encoding fails, the WAV
+    is what gets served. path() returns the best file for a key.
+
+    Entries are evicted least-recently-used first (put and path count as
+    use) while the folder holds more than max_bytes, and once unused for
+    max_age seconds. Files not named by key (older per-turn WAVs) are left
+    alone.
+    """
+    def __init__(self, folder, max_bytes, max_age, encoding='mp3', bitrate='48k', ffmpeg=None):
+        self.folder    = folder
+        self.max_bytes = max_bytes
+        self.max_age   = max_age
+        self.ffmpeg    = ffmpeg or shutil.which('ffmpeg')
+        self.encoding  = encoding if self.ffmpeg else None
+        self.args      = [a.format(bitrate=bitrate) for a in ENCODERS[encoding]]
+        self.lock      = threading.Lock()
+        self.entries   = OrderedDict()   # key -> {'wav', 'enc' (bytes, 0 if absent), 'keep_wav', 'queued', 'used'}
+        self.bytes     = 0
+        self.jobs      = queue.Queue()
+        self.counters  = {'stored':0, 'deduplicated':0, 'encoded':0, 'encode_failed':0, 'bytes_saved':0,
+                          'evicted':0, 'served':0, 'bytes_served':0}
+        self.last_error = None
+        os.makedirs(folder, exist_ok=True)
+        found = {}
+        for fn in os.listdir(folder):
+            key, ext = os.path.splitext(fn)
+            if KEY.fullmatch(key) and ext[1:] in ('wav', encoding):
+                st = os.stat(os.path.join(folder, fn))
+                entry = found.setdefault(key, {'wav':0, 'enc':0, 'keep_wav':False, 'queued':False, 'used':0})
+                entry['wav' if ext == '.wav' else 'enc'] = st.st_size
+                entry['used'] = max(entry['used'], st.st_mtime)
+        for key, entry in sorted(found.items(), key=lambda e: e[1]['used']):
+            self.entries[key] = entry
+            self.bytes += entry['wav'] + entry['enc']
+            if self.encoding and entry['wav'] and not entry['enc']:
+                entry['queued'] = True   # interrupted before it was encoded
+                self.jobs.put(key)
+        threading.Thread(target=self._work, name='audio-encoder', daemon=True).start()
+
+    def _path(self, key, ext):
+        return os.path.join(self.folder, f"{key}.{ext}")
+
+    def put(self, tmp, encode=True):
+        """Move a synthesized WAV into the store; returns its key, or None if there was no file."""
+        if not tmp or not os.path.exists(tmp):
+            return None
+        with open(tmp, 'rb') as f:
+            key = hashlib.sha256(f.read()).hexdigest()[:20]
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and (entry['wav'] or (encode and entry['enc'])):
+                os.remove(tmp)
+                self.counters['deduplicated'] += 1
+            else:
+                entry = entry or {'wav':0, 'enc':0, 'keep_wav':False, 'queued':False, 'used':0}
+                shutil.move(tmp, self._path(key, 'wav'))   # tmp may be on another filesystem
+                entry['wav'] = os.path.getsize(self._path(key, 'wav'))
+                self.bytes += entry['wav']
+                self.entries[key] = entry
+                self.counters['stored'] += 1
+            if encode and self.encoding and not entry['enc'] and not entry['queued']:
+                entry['queued'] = True
+                self.jobs.put(key)
+            entry['keep_wav'] = entry['keep_wav'] or not encode
+            self._touch(key)
+            self._evict()
+        return key
+
+    def path(self, key, wav=False):
+        """The file to serve for key (the encoded one when ready), or the WAV if wav is set; None if unknown."""
+        with self.lock:
+            entry = self.entries.get(key) if KEY.fullmatch(key or '') else None
+            if not entry:
+                return None
+            ext = 'wav' if wav or not entry['enc'] else self.encoding
+            if not entry['wav' if ext == 'wav' else 'enc']:
+                return None
+            self._touch(key)
+            return self._path(key, ext)
+
+    def served(self, nbytes):
+        """Count a response body sent to a player."""
+        with self.lock:
+            self.counters['served'] += 1
+            self.counters['bytes_served'] += nbytes
+
+    def _touch(self, key):
+        """Mark key as just used; caller holds the lock. File mtimes carry recency across restarts."""
+        entry = self.entries[key]
+        entry['used'] = time.time()
+        self.entries.move_to_end(key)
+        for ext in ('wav', self.encoding):
+            if ext and entry['wav' if ext == 'wav' else 'enc']:
+                try:
+                    os.utime(self._path(key, ext))
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self):
+        """Drop least recently used entries over max_bytes or older than max_age; caller holds the lock."""
+        cutoff = time.time() - self.max_age
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry['used'] >= cutoff and (self.bytes <= self.max_bytes or len(self.entries) == 1):
+                break
+            del self.entries[key]
+            self.bytes -= entry['wav'] + entry['enc']
+            for ext in ('wav', self.encoding):
+                if ext:
+                    try:
+                        os.remove(self._path(key, ext))
+                    except FileNotFoundError:
+                        pass
+            self.counters['evicted'] += 1
+
+    def _encode(self, key):
+        wav, out = self._path(key, 'wav'), self._path(key, self.encoding)
+        part = out + '.part'
+        try:
+            subprocess.run([self.ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', wav, *self.args, part],
+                           check=True, capture_output=True, timeout=120)
+        except Exception as e:
+            detail = e.stderr.decode(errors='replace').strip() if getattr(e, 'stderr', None) else e
+            if os.path.exists(part):
+                os.remove(part)
+            with self.lock:
+                if key not in self.entries:   # evicted while encoding
+                    return
+                self.entries[key]['queued'] = False
+                self.counters['encode_failed'] += 1
+                self.last_error = f"{key}: {detail}"
+            print(f"Encoding {wav} failed, serving the WAV:", detail)
+            return
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not entry['wav']:   # evicted while encoding
+                os.remove(part)
+                return
+            os.replace(part, out)
+            entry['queued'] = False
+            entry['enc'] = os.path.getsize(out)
+            self.bytes += entry['enc']
+            self.counters['encoded'] += 1
+            self.counters['bytes_saved'] += entry['wav'] - entry['enc']
+            if not entry['keep_wav']:
+                os.remove(wav)
+                self.bytes -= entry['wav']
+                entry['wav'] = 0
+
+    def _work(self):
+        while True:
+            try:
+                key = self.jobs.get(timeout=60)
+            except queue.Empty:
+                with self.lock:
+                    self._evict()   # age limit applies even when nothing new arrives
+                continue
+            try:
+                if key in self.entries:
+                    self._encode(key)
+            except OSError as e:   # e.g. the WAV is open elsewhere on Windows; it stays as the fallback
+                print(f"Encoding {key} failed:", e)
+
+    def stats(self):
+        with self.lock:
+            entries = list(self.entries.values())
+            served = self.counters['served']
+            return {
+                **self.counters,
+                'avg_bytes_per_reply_served': round(self.counters['bytes_served'] / served) if served else None,
+                'entries': len(entries),
+                'encoding': self.encoding or 'wav',
+                'pending': self.jobs.qsize(),
+                'wav_files': sum(1 for e in entries if e['wav']),
+                'encoded_files': sum(1 for e in entries if e['enc']),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'last_error': self.last_error,
+            }
@@ -0,0 +1,75 @@
+CHARS_PER_TOKEN = 4   # rough average for English with Gemma/Llama tokenizers
+
+def estimate_tokens(text):
+    """Approximate token count; close enough for budgeting without loading a tokenizer."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def clip_tokens(text, budget):
+    """text cut to about `budget` tokens, at a word boundary."""
+    limit = budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + " …"
+
+def format_entry(entry, name):
+    """One memory entry as prompt text: a turn, or a reflection/belief note."""
+    if 'user' in entry:
+        return f"Player: {entry['user']}\n{name}: {entry['ai']}\n"
+    return f"({entry.get('type', 'note')}) {entry.get('reflection', '')}\n"
+
+def build_context(npc_data, turns, core=None, reflection=None, budget=1024, instruction=""):
+    """
+    System prompt for a turn within about `budget` tokens, plus a report.
+
+    The persona and instructions are always included. The core belief and
+    latest reflection get at most a quarter of the budget each; recent
+    turns fill what is left, newest first, and are dropped once they no
+    longer fit. turns is oldest first.
+    """
+    name = npc_data['display_name']
+    head = f"{npc_data['base_prompt']}\nSpeaking Style: {npc_data['speaking_style']}\n"
+    tail = "Respond in 2–4 sentences.\n" + instruction
+    used = estimate_tokens(head) + estimate_tokens(tail)
+
+    notes = ""
+    if core:
+        notes += f"Core belief: {clip_tokens(core['reflection'], budget // 4)}\n"
+    if reflection:
+        notes += f"Recent reflection: {clip_tokens(reflection['reflection'], budget // 4)}\n"
+    used += estimate_tokens(notes)
+
+    recent = []
+    for entry in reversed(turns):
+        text = format_entry(entry, name)
+        cost = estimate_tokens(text)
+        if used + cost > budget:
+            break
+        recent.append(text)
+        used += cost
+    ctx = "".join(reversed(recent))
+
+    prompt = f"{head}{notes}Context:\n{ctx}\n{tail}"
+    return prompt, {'system_tokens':estimate_tokens(prompt), 'budget':budget,
+                    'turns':len(recent), 'turns_available':len(turns)}
+
+def fold_prompt(previous, entries, name, budget=1500):
+    """
+    Prompt that folds entries (oldest first) into the previous core belief,
+    and how many of them it covers: only as many as fit in `budget` tokens,
+    so the prompt stays the same size however far behind summarization is.
+    """
+    head = (
+        "Update this character's core belief with the new exchanges below. "
+        "Reply with the updated core belief only.\n"
+        f"Core belief: {previous or '(none yet)'}\n"
+        "New exchanges:\n"
+    )
+    used, lines = estimate_tokens(head), []
+    for entry in entries:
+        text = format_entry(entry, name)
+        cost = estimate_tokens(text)
+        if lines and used + cost > budget:
+            break
+        lines.append(text)
+        used += cost
+    return head + "".join(lines), len(lines)
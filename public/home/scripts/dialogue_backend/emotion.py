@@ -0,0 +1,159 @@
+import re
+from functools import lru_cache
+
+# Zonos settings per label, applied over EMOTION_BASE (e1-e8 are the emotion vector)
+EMOTION_PROFILES = {
+    "angry": {
+        "e6": 0.9,  # Anger
+        "e4": 0.1,  # Fear
+        "speaking_rate": 18,
+        "pitch_std": 60
+    },
+    "sad": {
+        "e2": 0.8,  # Sadness
+        "speaking_rate": 10,
+        "pitch_std": 30
+    },
+    "happy": {
+        "e1": 0.9,  # Happiness
+        "speaking_rate": 17,
+        "pitch_std": 50
+    },
+    "fearful": {
+        "e4": 0.8,  # Fear
+        "speaking_rate": 16,
+        "pitch_std": 55
+    },
+    "neutral": {
+        "e8": 0.8,  # Neutral
+        "speaking_rate": 15,
+        "pitch_std": 45
+    },
+    "disgusted": {
+        "e3": 0.9,  # Disgust
+        "speaking_rate": 13,
+        "pitch_std": 40
+    }
+}
+
+# Emotion vector a profile starts from, so one label's weights never carry over to another
+EMOTION_BASE = {"e1": 0.05, "e2": 0.05, "e3": 0.05, "e4": 0.05, "e5": 0.05, "e6": 0.05, "e7": 0.1, "e8": 0.2}
+
+EMOTION_LABELS = tuple(EMOTION_PROFILES)
+
+# Words the model (or an old free-text classification) may use for a label
+SYNONYMS = {
+    "angry": ("anger", "mad", "furious", "annoyed", "irritated", "hostile", "frustrated"),
+    "sad": ("sadness", "sorrow", "sorrowful", "melancholy", "grief", "grieving", "gloomy", "lonely", "wistful"),
+    "happy": ("happiness", "joy", "joyful", "cheerful", "glad", "excited", "hopeful", "amused", "warm", "friendly", "content"),
+    "fearful": ("fear", "afraid", "scared", "anxious", "nervous", "worried", "wary", "tense", "uneasy"),
+    "disgusted": ("disgust", "revolted", "repulsed", "contempt", "sickened"),
+    "neutral": ("calm", "flat", "matter-of-fact", "indifferent", "stoic"),
+}
+LABEL_FOR_WORD = {word: label for label, words in SYNONYMS.items() for word in words}
+LABEL_FOR_WORD.update({label: label for label in EMOTION_LABELS})
+
+# Cue words for classifying a reply without the LLM
+LEXICON = {
+    "angry": ("damn", "hell", "fight", "kill", "enough", "shut", "hate", "back off", "get out", "how dare", "fool", "idiot"),
+    "sad": ("lost", "gone", "miss", "died", "dead", "alone", "sorry", "tears", "cry", "grave", "never again", "used to"),
+    "happy": ("glad", "good", "great", "laugh", "friend", "thanks", "thank you", "love", "blessing", "lucky", "nice", "haha", "welcome"),
+    "fearful": ("careful", "danger", "afraid", "scared", "run", "hide", "quiet", "watch out", "something out there", "tracks", "don't go"),
+    "disgusted": ("rot", "stink", "filth", "gross", "sick", "vile", "rats", "maggots", "foul", "disgusting"),
+}
+
+TAG = re.compile(r'^\s*\[\s*(?:mood|emotion)?\s*:?\s*([a-z-]+)\s*\]\s*', re.IGNORECASE)
+MAX_TAG_LENGTH = 24
+
+def emotion_instruction():
+    """Prompt line asking the model to lead its reply with a mood tag."""
+    return f"Begin with your mood in square brackets, one of: {', '.join(EMOTION_LABELS)}. Example: [neutral] ..."
+
+def split_emotion_tag(text):
+    """(label or None, reply without a leading [mood] tag)."""
+    match = TAG.match(text)
+    if not match:
+        return None, text
+    return LABEL_FOR_WORD.get(match.group(1).lower()), text[match.end():]
+
+@lru_cache(maxsize=4096)
+def _classify_normalized(text):
+    # text is space-separated words, so padding with spaces matches whole words and phrases
+    padded = f" {text} "
+    scores = {label: sum(padded.count(f" {cue} ") for cue in cues) for label, cues in LEXICON.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] else "neutral"
+
+def classify_emotion(text):
+    """One of EMOTION_LABELS for a reply, from cue words; memoized on the normalized text."""
+    return _classify_normalized(" ".join(re.findall(r"[a-z']+", text.lower())))
+
+def normalize_emotion(value):
+    """Map any emotion text (a label, a synonym, or an old free-text classification) to a label."""
+    words = re.findall(r"[a-z-]+", (value or "").lower())
+    for word in words:
+        if word in LABEL_FOR_WORD:
+            return LABEL_FOR_WORD[word]
+    return classify_emotion(value or "")
+
+def emotion_settings(settings, emotion):
+    """Zonos settings with the profile for emotion (any text normalize_emotion understands) applied."""
+    return {**settings, **EMOTION_BASE, **EMOTION_PROFILES[normalize_emotion(emotion)]}
+
+def reply_emotion(reply):
+    """(label, reply text) for a raw model reply: its own tag if valid, else the local classifier."""
+    label, text = split_emotion_tag(reply)
+    text = text.strip()
+    return label or classify_emotion(text), text
+
+class EmotionTagStripper:
+    """
+    Streaming counterpart of split_emotion_tag(): feed() reply chunks as
+    they arrive and get back the text to show, with a leading [mood] tag
+    held back and removed. label is set once the tag has been seen.
+    """
+    def __init__(self):
+        self.head = ""
+        self.resolved = False
+        self.label = None
+
+    def feed(self, chunk):
+        if self.resolved:
+            return chunk
+        self.head += chunk
+        start = self.head.lstrip()
+        if not start:
+            return ""
+        if start[0] != '[':
+            return self.flush()
+        if ']' not in start:
+            return "" if len(start) < MAX_TAG_LENGTH else self.flush()
+        self.label, rest = split_emotion_tag(self.head)
+        self.resolved = True
+        return rest
+
+    def flush(self):
+        """Text still held back (call once the stream ends)."""
+        text, self.head = ("" if self.resolved else self.head), ""
+        self.resolved = True
+        return text
+
+    def strip(self, chunks):
+        """Wrap a chunk iterator, yielding only reply text."""
+        for chunk in chunks:
+            text = self.feed(chunk)
+            if text:
+                yield text
+        rest = self.flush()
+        if rest:
+            yield rest
+
+    async def astrip(self, chunks):
+        """strip() for an async chunk iterator."""
+        async for chunk in chunks:
+            text = self.feed(chunk)
+            if text:
+                yield text
+        rest = self.flush()
+        if rest:
+            yield rest
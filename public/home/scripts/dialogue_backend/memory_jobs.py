@@ -0,0 +1,68 @@
+import queue, threading, time
+
+class MaintenanceQueue:
+    """
+    Background workers for per-NPC memory maintenance (reflection, summarization).
+
+    At most one job per NPC exists at a time: submitting while a job is waiting
+    merges the new tasks into it, and submitting while one is running queues a
+    single follow-up that starts when it finishes. handler(npc_id, tasks) does
+    the work and is responsible for merging its results into current memory.
+    """
+    def __init__(self, handler, workers=1):
+        self.handler = handler
+        self.lock    = threading.Lock()
+        self.ready   = queue.Queue()   # npc ids whose pending job can start
+        self.pending = {}              # npc_id -> set of tasks not yet started
+        self.running = {}              # npc_id -> start time
+        self.idle    = threading.Condition(self.lock)
+        self.counters = {'submitted':0, 'merged':0, 'completed':0, 'failed':0}
+        self.last_error = None
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f'memory-maintenance-{i}', daemon=True).start()
+
+    def submit(self, npc_id, *tasks):
+        with self.lock:
+            self.counters['submitted'] += 1
+            if npc_id in self.pending:
+                self.pending[npc_id].update(tasks)
+                self.counters['merged'] += 1
+                return
+            self.pending[npc_id] = set(tasks)
+            if npc_id not in self.running:
+                self.ready.put(npc_id)
+
+    def _work(self):
+        while True:
+            npc_id = self.ready.get()
+            with self.lock:
+                tasks = self.pending.pop(npc_id)
+                self.running[npc_id] = time.time()
+            try:
+                self.handler(npc_id, tasks)
+                outcome = 'completed'
+            except Exception as e:
+                print(f"Memory maintenance for {npc_id} failed:", e)
+                outcome, self.last_error = 'failed', f"{npc_id}: {e}"
+            with self.lock:
+                self.counters[outcome] += 1
+                del self.running[npc_id]
+                if npc_id in self.pending:
+                    self.ready.put(npc_id)
+                self.idle.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until nothing is pending or running; returns False on timeout."""
+        with self.lock:
+            return self.idle.wait_for(lambda: not self.pending and not self.running, timeout)
+
+    def status(self):
+        with self.lock:
+            now = time.time()
+            return {
+                'queue_depth': len(self.pending),
+                'pending': {npc: sorted(tasks) for npc, tasks in self.pending.items()},
+                'running': {npc: round(now - started, 2) for npc, started in self.running.items()},
+                **self.counters,
+                'last_error': self.last_error,
+            }
@@ -0,0 +1,266 @@
+import atexit, json, os, sys, threading, time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows: locking is per-process only
+    fcntl = None
+
+TAIL_BLOCK = 8192
+
+class MemoryStore:
+    """
+    Append-only NPC memory. Each NPC has `<npc>_memory.jsonl` with one entry
+    per line: a turn is a single appended line, and tail() reads backwards
+    from the end of the file instead of parsing the whole history. replace()
+    is the compaction step (summarization) and atomically rewrites the log.
+
+    Parsed histories are kept in process and checked against the file's
+    inode/size/mtime, so repeat reads cost one stat and a change made by
+    another process is picked up on the next read. With flush_delay > 0,
+    append() only queues the entry and a background thread writes it within
+    about flush_delay seconds (and at exit); reads always include queued
+    entries. lock(npc_id) serializes writers across threads and, where
+    fcntl exists, across processes. A legacy `<npc>_memory.json` is imported
+    on first use and left in place untouched.
+    """
+    def __init__(self, folder, flush_delay=0):
+        self.folder  = folder
+        self.flush_delay = flush_delay
+        self.guard   = threading.Lock()
+        self.locks   = {}   # npc_id -> [RLock, depth, lock file]
+        self.cache   = {}   # npc_id -> (file signature, entries, turns, end of last full line)
+        self.pending = {}   # npc_id -> entries appended but not yet written
+        self.wakeup  = threading.Event()
+        os.makedirs(folder, exist_ok=True)
+        if flush_delay > 0:
+            threading.Thread(target=self._flusher, name='memory-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def log_path(self, npc_id):
+        return os.path.join(self.folder, f"{npc_id}_memory.jsonl")
+
+    def legacy_path(self, npc_id):
+        return os.path.join(self.folder, f"{npc_id}_memory.json")
+
+    @contextmanager
+    def lock(self, npc_id):
+        """Per-NPC writer lock; reentrant within a thread."""
+        with self.guard:
+            state = self.locks.setdefault(npc_id, [threading.RLock(), 0, None])
+        with state[0]:
+            if state[1] == 0 and fcntl:
+                state[2] = open(os.path.join(self.folder, f"{npc_id}_memory.lock"), 'a')
+                fcntl.flock(state[2], fcntl.LOCK_EX)
+            state[1] += 1
+            try:
+                yield
+            finally:
+                state[1] -= 1
+                if state[1] == 0 and state[2]:
+                    state[2].close()   # releases the flock
+                    state[2] = None
+
+    def _ensure_log(self, npc_id):
+        path = self.log_path(npc_id)
+        if not os.path.exists(path) and os.path.exists(self.legacy_path(npc_id)):
+            with self.lock(npc_id):
+                if not os.path.exists(path):
+                    self.import_legacy(npc_id)
+        return path
+
+    def import_legacy(self, npc_id):
+        """Convert `<npc>_memory.json` into the log format; returns the number of entries."""
+        with open(self.legacy_path(npc_id)) as f:
+            memory = json.load(f)
+        self.replace(npc_id, memory)
+        print(f"Imported {len(memory)} memory entries for {npc_id}")
+        return len(memory)
+
+    def import_all(self):
+        """One-time migration of every legacy memory file that has no log yet."""
+        imported = {}
+        for fn in sorted(os.listdir(self.folder)):
+            if fn.endswith('_memory.json'):
+                npc_id = fn[:-len('_memory.json')]
+                if not os.path.exists(self.log_path(npc_id)):
+                    with self.lock(npc_id):
+                        imported[npc_id] = self.import_legacy(npc_id)
+        return imported
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def _parse(data):
+        # A line without its newline is a torn append from a crash; ignore it
+        return [json.loads(line) for line in data.split(b'\n')[:-1] if line.strip()]
+
+    def _cached(self, npc_id):
+        """(signature, entries, turns, end) for what is on disk; caller holds the lock."""
+        path = self._ensure_log(npc_id)
+        sig = self._signature(path)
+        cached = self.cache.get(npc_id)
+        if cached is None or cached[0] != sig:
+            data = b''
+            if sig:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            entries = self._parse(data)
+            cached = (sig, entries, sum(1 for e in entries if 'user' in e), data.rfind(b'\n') + 1)
+            self.cache[npc_id] = cached
+        return cached
+
+    def _tag(self, npc_id, sig):
+        ino, size, mtime = sig or (0, 0, 0)
+        return f"{ino:x}-{size:x}-{mtime:x}-{len(self.pending.get(npc_id, ()))}"
+
+    def load(self, npc_id):
+        """Full history, oldest first."""
+        return self.snapshot(npc_id)[1]
+
+    def snapshot(self, npc_id):
+        """(version tag, full history); the tag changes whenever the history may have."""
+        with self.lock(npc_id):
+            sig, entries = self._cached(npc_id)[:2]
+            return self._tag(npc_id, sig), entries + self.pending.get(npc_id, [])
+
+    def tail(self, npc_id, n, where=None):
+        """Last n entries (only those matching `where`, if given), oldest first."""
+        if n <= 0:
+            return []
+        with self.lock(npc_id):
+            path = self._ensure_log(npc_id)
+            found = self._newest(self.pending.get(npc_id, ()), n, where)
+            if len(found) == n:
+                return found
+            cached = self.cache.get(npc_id)
+            if cached and cached[0] == self._signature(path):
+                older = self._newest(cached[1], n - len(found), where)
+            else:
+                older = self._read_tail(path, n - len(found), where)
+            return older + found
+
+    @staticmethod
+    def _newest(entries, n, where):
+        found = []
+        for entry in reversed(entries):
+            if len(found) == n:
+                break
+            if where is None or where(entry):
+                found.append(entry)
+        return found[::-1]
+
+    @staticmethod
+    def _read_tail(path, n, where):
+        found = []
+        if not os.path.exists(path):
+            return found
+        with open(path, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            rest, torn = b'', True   # text after the last newline is not a complete entry
+            while pos > 0 and len(found) < n:
+                step = min(TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + rest).split(b'\n')
+                rest = lines.pop(0)
+                for line in reversed(lines):
+                    if torn:
+                        torn = False
+                        continue
+                    if line.strip():
+                        entry = json.loads(line)
+                        if where is None or where(entry):
+                            found.append(entry)
+                            if len(found) == n:
+                                break
+            if pos == 0 and len(found) < n and rest.strip() and not torn:
+                entry = json.loads(rest)
+                if where is None or where(entry):
+                    found.append(entry)
+        return found[::-1]
+
+    def stats(self, npc_id):
+        """{'entries', 'turns', 'pending'} for an NPC."""
+        with self.lock(npc_id):
+            entries, turns = self._cached(npc_id)[1:3]
+            pending = self.pending.get(npc_id, [])
+            return {'entries':len(entries) + len(pending),
+                    'turns':turns + sum(1 for e in pending if 'user' in e),
+                    'pending':len(pending)}
+
+    def append(self, npc_id, entry):
+        """Add one entry at the end; returns the updated stats()."""
+        with self.lock(npc_id):
+            self._cached(npc_id)
+            self.pending.setdefault(npc_id, []).append(entry)
+            if self.flush_delay <= 0:
+                self._flush(npc_id)
+            else:
+                self.wakeup.set()
+            return self.stats(npc_id)
+
+    def _flush(self, npc_id):
+        # Caller holds the lock
+        pending = self.pending.get(npc_id)
+        if not pending:
+            return
+        sig, entries, turns, end = self._cached(npc_id)
+        path = self.log_path(npc_id)
+        with open(path, 'ab') as f:
+            if f.tell() != end:
+                f.truncate(end)   # drop a torn line left by a crash
+            f.write(b''.join((json.dumps(e) + '\n').encode() for e in pending))
+            f.flush()
+            end = f.tell()
+        del self.pending[npc_id]
+        self.cache[npc_id] = (self._signature(path), entries + pending,
+                              turns + sum(1 for e in pending if 'user' in e), end)
+
+    def flush(self):
+        """Write every queued entry now."""
+        for npc_id in list(self.pending):
+            with self.lock(npc_id):
+                self._flush(npc_id)
+
+    def _flusher(self):
+        while True:
+            self.wakeup.wait()
+            time.sleep(self.flush_delay)   # batch whatever else arrives meanwhile
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print("Memory flush failed:", e)
+                self.wakeup.set()
+
+    def replace(self, npc_id, memory):
+        """
+        Atomically rewrite the whole log (compaction, imports). Queued entries
+        are discarded: callers read, modify and replace under lock(), so the
+        memory they pass in already contains them.
+        """
+        path = self.log_path(npc_id)
+        tmp = path + '.tmp'
+        with self.lock(npc_id):
+            self.pending.pop(npc_id, None)
+            with open(tmp, 'w') as f:
+                for entry in memory:
+                    f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+                end = f.tell()
+            os.replace(tmp, path)
+            memory = list(memory)
+            self.cache[npc_id] = (self._signature(path), memory, sum(1 for e in memory if 'user' in e), end)
+
+if __name__ == '__main__':
+    # One-time import: python memory_store.py [npc_brains folder]
+    store = MemoryStore(sys.argv[1] if len(sys.argv) > 1 else 'npc_brains')
+    print(store.import_all() or "Nothing to import")
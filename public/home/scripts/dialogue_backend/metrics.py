@@ -0,0 +1,174 @@
+import json, math, os, threading, time
+from collections import deque
+from contextlib import nullcontext
+
+QUANTILES = (0.5, 0.95, 0.99)
+ALL = "_all"     # npc label for the aggregate over every NPC
+OTHER = "_other" # npc label for ids past max_npcs
+
+def quantile(values, q):
+    """Nearest-rank quantile of a sorted, non-empty list."""
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
+
+def label_value(value):
+    """Escape a Prometheus label value (backslash, double quote, newline)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _Stage:
+    """Times a with-block into a Metrics (and optionally a Trace)."""
+    __slots__ = ('metrics', 'name', 'npc_id', 'trace', 'started')
+
+    def __init__(self, metrics, name, npc_id, trace=None):
+        self.metrics, self.name, self.npc_id, self.trace = metrics, name, npc_id, trace
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.started) * 1000
+        self.metrics.observe(self.name, self.npc_id, ms)
+        if self.trace is not None:
+            self.trace.stages[self.name] = round(self.trace.stages.get(self.name, 0) + ms, 1)
+        if exc is not None and not isinstance(exc, GeneratorExit):   # a closed stream isn't an error
+            self.metrics.error(self.name, self.npc_id, exc)
+            if self.trace is not None:
+                self.trace.errors.append(f"{self.name}: {type(exc).__name__}: {exc}")
+        return False
+
+class Trace:
+    """
+    One turn: per-stage times and extra fields, written as a single JSON
+    line (and a 'turn' observation) by finish().
+    """
+    def __init__(self, metrics, npc_id, kind):
+        self.metrics = metrics
+        self.record = {'npc':npc_id, 'kind':kind, 'ts':round(time.time(), 3)}
+        self.stages = {}
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def stage(self, name):
+        return _Stage(self.metrics, name, self.record['npc'], self)
+
+    def note(self, **fields):
+        self.record.update(fields)
+
+    def error(self, name, error):
+        self.metrics.error(name, self.record['npc'], error)
+        self.errors.append(f"{name}: {error}")
+
+    def finish(self, **fields):
+        total = (time.perf_counter() - self.started) * 1000
+        self.metrics.observe(self.record['kind'], self.record['npc'], total)
+        self.record.update(fields, total_ms=round(total, 1), stages=self.stages)
+        if self.errors:
+            self.record['errors'] = self.errors
+        self.metrics.log(self.record)
+
+class _NullTrace:
+    def stage(self, name):
+        return NULL_STAGE
+
+    def note(self, **fields):
+        pass
+
+    def error(self, name, error):
+        pass
+
+    def finish(self, **fields):
+        pass
+
+NULL_STAGE = nullcontext()
+NULL_TRACE = _NullTrace()
+
+class Metrics:
+    """
+    Rolling per-stage latency windows, per NPC and over all NPCs, plus
+    error counts. Quantiles cover the last `window` samples; _count/_sum
+    are cumulative. render() is the Prometheus text format for /metrics.
+    Traces are appended to log_path as JSON lines when it is set.
+
+    npc ids come from request URLs, so only the first max_npcs get their
+    own series; later ones are counted under OTHER (and in ALL).
+
+    Disabled, stage() and trace() return shared no-op objects, so
+    instrumented code costs one attribute check per call.
+    """
+    def __init__(self, enabled=True, window=1024, log_path=None, max_npcs=64):
+        self.enabled = enabled
+        self.window = window
+        self.max_npcs = max_npcs
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.samples = {}   # (stage, npc) -> deque of ms
+        self.totals = {}    # (stage, npc) -> [count, sum ms]
+        self.errors = {}    # (stage, npc) -> count
+        self.npcs = set()   # ids with their own series
+        self.log_lock = threading.Lock()
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+
+    def stage(self, name, npc_id=None):
+        return _Stage(self, name, npc_id) if self.enabled else NULL_STAGE
+
+    def trace(self, npc_id, kind='turn'):
+        return Trace(self, npc_id, kind) if self.enabled else NULL_TRACE
+
+    def observe(self, name, npc_id, ms):
+        if not self.enabled:
+            return
+        with self.lock:
+            for key in self._keys(name, npc_id):
+                window = self.samples.get(key)
+                if window is None:
+                    window = self.samples[key] = deque(maxlen=self.window)
+                    self.totals[key] = [0, 0.0]
+                window.append(ms)
+                totals = self.totals[key]
+                totals[0] += 1
+                totals[1] += ms
+
+    def error(self, name, npc_id, error):
+        if not self.enabled:
+            return
+        with self.lock:
+            for key in self._keys(name, npc_id):
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def _keys(self, name, npc_id):
+        """Series a sample for npc_id goes into; caller holds the lock."""
+        if not npc_id:
+            return ((name, ALL),)
+        if npc_id not in self.npcs:
+            if len(self.npcs) >= self.max_npcs:
+                return ((name, ALL), (name, OTHER))
+            self.npcs.add(npc_id)
+        return ((name, ALL), (name, npc_id))
+
+    def log(self, record):
+        if not self.log_path:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self.log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def render(self):
+        with self.lock:
+            windows = {key: sorted(values) for key, values in self.samples.items()}
+            totals = {key: tuple(value) for key, value in self.totals.items()}
+            errors = dict(self.errors)
+        lines = ["# HELP npc_stage_seconds Latency of each turn stage (quantiles over a rolling window).",
+                 "# TYPE npc_stage_seconds summary"]
+        for (name, npc), values in sorted(windows.items()):
+            labels = f'stage="{label_value(name)}",npc="{label_value(npc)}"'
+            for q in QUANTILES:
+                lines.append(f'npc_stage_seconds{{{labels},quantile="{q}"}} {quantile(values, q) / 1000:.6f}')
+            count, total = totals[(name, npc)]
+            lines.append(f'npc_stage_seconds_count{{{labels}}} {count}')
+            lines.append(f'npc_stage_seconds_sum{{{labels}}} {total / 1000:.6f}')
+        lines += ["# HELP npc_stage_errors_total Errors raised or reported by each turn stage.",
+                  "# TYPE npc_stage_errors_total counter"]
+        for (name, npc), count in sorted(errors.items()):
+            lines.append(f'npc_stage_errors_total{{stage="{label_value(name)}",npc="{label_value(npc)}"}} {count}')
+        return "\n".join(lines) + "\n"
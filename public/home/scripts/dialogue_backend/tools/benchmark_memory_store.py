@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory_store import MemoryStore
+
+NPC_ID = "bench"
+
+def make_entry(i):
+    return {
+        "user": f"Question number {i}: what did you find out past the ridge today?",
+        "ai": "Not much, friend. Rusted cans, a radio with no batteries, and tracks I'd rather not follow. " * 3,
+        "emotion": "wary",
+        "likes": 0,
+    }
+
+def per_call_ms(turns, fn):
+    start = time.perf_counter()
+    for i in range(turns):
+        fn(i)
+    return (time.perf_counter() - start) / turns * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-file JSON memory with the append-only store")
+    parser.add_argument("--entries", type=int, default=10000, help="history length per NPC")
+    parser.add_argument("--turns", type=int, default=200, help="turns to time on top of that history")
+    args = parser.parse_args()
+    history = [make_entry(i) for i in range(args.entries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # What app.py used to do every turn: read the file, take the tail, rewrite it all
+        legacy = os.path.join(tmp, f"{NPC_ID}_memory.json")
+        with open(legacy, 'w') as f:
+            json.dump(history, f, indent=4)
+
+        store = MemoryStore(tmp)
+        start = time.perf_counter()
+        store.import_all()
+        import_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        MemoryStore(tmp).stats(NPC_ID)   # first touch per process parses the log once
+        scan_ms = (time.perf_counter() - start) * 1000
+
+        def legacy_turn(i):
+            with open(legacy) as f:
+                memory = json.load(f)
+            memory.append(make_entry(i))
+            with open(legacy, 'w') as f:
+                json.dump(memory, f, indent=4)
+
+        legacy_ms = per_call_ms(args.turns, legacy_turn)
+
+        def store_turn(i):
+            store.tail(NPC_ID, 3)
+            store.append(NPC_ID, make_entry(i))
+
+        store_ms = per_call_ms(args.turns, store_turn)
+        tail_ms = per_call_ms(args.turns, lambda i: store.tail(NPC_ID, 5, where=lambda e: 'user' in e))
+        cold_load_ms = per_call_ms(5, lambda i: MemoryStore(tmp).load(NPC_ID))
+        load_ms = per_call_ms(args.turns, lambda i: store.load(NPC_ID))
+        assert len(store.load(NPC_ID)) == args.entries + args.turns
+
+        print(f"\nHistory: {args.entries} entries, {os.path.getsize(store.log_path(NPC_ID)) / 1024:.0f} KB log, "
+              f"{os.path.getsize(legacy) / 1024:.0f} KB legacy JSON")
+        print(f"{'legacy turn (load + rewrite)':>32}: {legacy_ms:9.3f} ms")
+        print(f"{'store turn (tail + append)':>32}: {store_ms:9.3f} ms  ({legacy_ms / store_ms:.0f}x faster)")
+        print(f"{'store tail(5 turns)':>32}: {tail_ms:9.3f} ms")
+        print(f"{'store full load (cached)':>32}: {load_ms:9.3f} ms")
+        print(f"{'store full load (cold)':>32}: {cold_load_ms:9.3f} ms")
+        print(f"{'first-touch count scan':>32}: {scan_ms:9.3f} ms")
+        print(f"{'one-time import':>32}: {import_ms:9.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline benchmark suite for the dialogue pipeline, with stub Ollama/Zonos.
+
+    python tools/benchmark_suite.py --save-baseline tools/baseline.json
+    python tools/benchmark_suite.py --compare tools/baseline.json
+
+Players hold scripted conversations of different lengths (SCRIPTS) with
+their own NPC, concurrently. Each player uses one client flow:
+
+    page     POST /npc/<id> and follow the redirect (npc_interaction); the reply
+             and audio are read back from the page
+    turn     POST /npc/<id>/turn with include_audio, as mic_talk does
+    memory   after every turn, GET /npc/<id>/memory twice: the first picks up
+             the new turn, the second revalidates with its ETag and should 304
+    stream   GET /npc/<id>/stream to the done event (paced by --tokens-per-second)
+
+The report has per-flow throughput, latency p50/p95/p99, errors,
+degraded turns (answered, but with an LLM error as the reply, no audio,
+or sentences whose TTS failed, which is how injected failures surface)
+and the TTS sentence failures behind them (n/a for the page flow, which
+only sees whether there was audio), 304s on the memory flow, the
+growth of the memory files, and process RSS. A run whose memory flow
+never gets a 304 fails. --save-baseline writes it as JSON; --compare
+exits 1 if throughput or p95 is more than --tolerance worse than the
+saved run.
+"""
+import argparse
+import asyncio
+import glob
+import html
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import threading
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import prepare_workdir, serve_asgi, serve_flask, start_stub_ollama, wait_until_up
+from stub_servers import StubZonosClient, install_stub_zonos
+
+SCRIPTS = {
+    'short': ["Hey.", "Any news?", "See you."],
+    'medium': ["Hello there.", "What happened to the town?", "Who runs the market now?",
+               "Is the water safe?", "Where can I find fuel?", "Have you seen raiders?",
+               "What do you need?", "I can help with that.", "Thanks for the tip.", "Goodbye."],
+}
+SCRIPTS['long'] = [f"{line} ({n})" for n in range(4) for line in SCRIPTS['medium']]
+FLOWS = ('page', 'turn', 'memory', 'stream')
+# NPC line of a memory entry on npc.html
+PAGE_REPLY = re.compile(r'<li class="memory-entry">.*?</strong>.*?</strong>\s*(.*?)<br>', re.DOTALL)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else None
+
+def rss_mb():
+    """Current resident set size (Linux /proc), else the peak from getrusage."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def memory_bytes():
+    return sum(os.path.getsize(p) for p in glob.glob(os.path.join('npc_brains', '*_memory.jsonl')))
+
+def degraded(turn):
+    return turn['reply'].startswith("Error:") or not turn['audio_url'] or bool(turn.get('tts_failures'))
+
+def page_turn(r):
+    """The turn as the redirected npc_interaction page shows it: the newest memory entry and ?audio=."""
+    replies = PAGE_REPLY.findall(r.text)
+    return {'reply': html.unescape(replies[-1]) if replies else "Error: no reply on the page",
+            'audio_url': r.url.params.get('audio')}
+
+def count_turn(result, turn):
+    result['degraded'] += degraded(turn)
+    result['tts_failures'] += turn.get('tts_failures') or 0
+
+async def play(client, flow, npc_id, script, results):
+    etag = None
+    for line in script:
+        start = time.perf_counter()
+        try:
+            if flow == 'page':
+                r = await client.post(f"/npc/{npc_id}", data={'user_input':line})
+                r.raise_for_status()
+                count_turn(results[flow], page_turn(r))
+            elif flow == 'turn':
+                r = await client.post(f"/npc/{npc_id}/turn", json={'user_input':line, 'include_audio':True})
+                r.raise_for_status()
+                count_turn(results[flow], r.json())
+            elif flow == 'stream':
+                r = await client.get(f"/npc/{npc_id}/stream", params={'user_input':line})
+                r.raise_for_status()
+                done = json.loads(r.text.rstrip().rsplit("data: ", 1)[-1])
+                count_turn(results[flow], done)
+            else:
+                r = await client.post(f"/npc/{npc_id}/turn", json={'user_input':line})
+                r.raise_for_status()
+                count_turn(results[flow], r.json())
+                for _ in range(2):   # time the memory fetches, not the turn that fed them
+                    start = time.perf_counter()
+                    r = await client.get(f"/npc/{npc_id}/memory", headers={'If-None-Match':etag} if etag else {})
+                    if r.status_code not in (200, 304):
+                        r.raise_for_status()
+                    results[flow]['not_modified'] += r.status_code == 304
+                    etag = r.headers.get('ETag', etag)
+                    results[flow]['latencies'].append(time.perf_counter() - start)
+                continue
+            results[flow]['latencies'].append(time.perf_counter() - start)
+        except Exception as e:
+            results[flow]['errors'].append(repr(e))
+
+async def run_players(base_url, players):
+    results = {flow: {'latencies':[], 'errors':[], 'degraded':0, 'tts_failures':0, 'not_modified':0} for flow in FLOWS}
+    limits = httpx.Limits(max_connections=len(players) * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits, follow_redirects=True) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(play(client, flow, npc_id, script, results) for flow, npc_id, script in players))
+        return time.perf_counter() - start, results
+
+def summarize(wall, results):
+    report = {}
+    for flow, r in results.items():
+        latencies = r['latencies']
+        report[flow] = {
+            'requests': len(latencies),
+            'errors': len(r['errors']),
+            'degraded': r['degraded'],
+            'tts_failures': None if flow == 'page' else r['tts_failures'],
+            'throughput': round(len(latencies) / wall, 2),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        }
+        if flow == 'memory':
+            report[flow]['not_modified'] = r['not_modified']
+        if r['errors']:
+            report[flow]['first_error'] = r['errors'][0]
+    return report
+
+def compare(report, baseline, tolerance):
+    """Lines describing regressions against a saved report."""
+    problems = []
+    for flow in FLOWS:
+        now, then = report['flows'].get(flow), baseline['flows'].get(flow)
+        if not now or not then:
+            continue
+        if then['throughput'] and now['throughput'] < then['throughput'] * (1 - tolerance):
+            problems.append(f"{flow}: throughput {now['throughput']} < baseline {then['throughput']}")
+        if then['p95_ms'] and now['p95_ms'] and now['p95_ms'] > then['p95_ms'] * (1 + tolerance):
+            problems.append(f"{flow}: p95 {now['p95_ms']} ms > baseline {then['p95_ms']} ms")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline dialogue backend benchmarks with stub LLM/TTS servers")
+    parser.add_argument("--mode", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--players", type=int, default=6, help="concurrent players per flow and script")
+    parser.add_argument("--scripts", default="short,medium,long", help=f"comma list of {', '.join(SCRIPTS)}")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub Ollama seconds before replying")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="stub Ollama streaming rate (words)")
+    parser.add_argument("--llm-fail-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="stub Zonos seconds per call")
+    parser.add_argument("--tts-per-char", type=float, default=0.002, help="stub Zonos seconds per character")
+    parser.add_argument("--tts-fail-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=5065)
+    parser.add_argument("--stub-port", type=int, default=5066)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fractional regression")
+    args = parser.parse_args()
+    save_path = args.save_baseline and os.path.abspath(args.save_baseline)
+    compare_path = args.compare and os.path.abspath(args.compare)
+    scripts = args.scripts.split(',')
+
+    workdir = prepare_workdir()
+    ollama, ollama_url = start_stub_ollama(args.stub_port, args.llm_latency,
+                                           token_delay=1 / args.tokens_per_second, fail_rate=args.llm_fail_rate)
+    install_stub_zonos(latency=args.tts_latency, per_char=args.tts_per_char, fail_rate=args.tts_fail_rate)
+    import app as backend
+    backend.OLLAMA_URL = ollama_url
+    if args.mode == "asgi":
+        import asgi_app
+        stop = serve_asgi(asgi_app.app, args.port)
+    else:
+        stop = serve_flask(backend.app, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    players = [(flow, f"bench_{flow}_{name}_{i}", SCRIPTS[name])
+               for flow in FLOWS for name in scripts for i in range(args.players)]
+    rss_before = rss_mb()
+    peak_rss = rss_before
+    sampling = True
+
+    def sample_rss():
+        nonlocal peak_rss
+        while sampling:
+            peak_rss = max(peak_rss, rss_mb())
+            time.sleep(0.1)
+
+    async def run():
+        await wait_until_up(base_url)
+        return await run_players(base_url, players)
+
+    threading.Thread(target=sample_rss, daemon=True).start()
+    wall, results = asyncio.run(run())
+    sampling = False
+    stop()
+    # Reflection/summarization jobs are still appending; let them finish before flushing and deleting
+    if not backend.maintenance.wait_idle(timeout=120):
+        print("Memory maintenance still running after 120s")
+    backend.memory_store.flush()
+    turns = sum(len(script) for _, _, script in players)
+    grown = memory_bytes()
+    stub_stats = httpx.get(ollama_url).json()
+    ollama.terminate()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k not in ('save_baseline', 'compare')},
+        'wall_s': round(wall, 2),
+        'turns': turns,
+        'flows': summarize(wall, results),
+        'memory_file_bytes': grown,
+        'memory_bytes_per_turn': round(grown / turns, 1) if turns else 0,
+        'rss_mb': {'start': round(rss_before, 1), 'peak': round(peak_rss, 1)},
+        'stubs': {'llm_calls': stub_stats['calls'], 'llm_failures': stub_stats['failures'],
+                  'tts_calls': StubZonosClient.calls, 'tts_failures': StubZonosClient.failures},
+    }
+
+    print(f"\nmode={args.mode} players={len(players)} scripts={args.scripts} turns={turns} wall={wall:.1f}s")
+    for flow, r in report['flows'].items():
+        print(f"{flow:>7}: {r['throughput']:7.2f} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+              f"p99 {r['p99_ms']} ms  errors {r['errors']}  degraded {r['degraded']}  tts failures {'n/a' if r['tts_failures'] is None else r['tts_failures']}"
+              + (f"  304s {r['not_modified']}" if 'not_modified' in r else ""))
+    print(f" memory: {grown} bytes on disk, {report['memory_bytes_per_turn']} bytes/turn")
+    print(f"    rss: {report['rss_mb']['start']} MB at start, {report['rss_mb']['peak']} MB peak")
+    print(f"  stubs: {report['stubs']}")
+
+    memory = report['flows']['memory']
+    if memory['requests'] and not memory['not_modified']:
+        print("FAILED: the memory flow never got a 304; ETag revalidation is broken")
+        sys.exit(1)
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {save_path}")
+    if compare_path:
+        with open(compare_path) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print("REGRESSION", problem)
+        if problems:
+            sys.exit(1)
+        print(f"No regressions against {compare_path} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
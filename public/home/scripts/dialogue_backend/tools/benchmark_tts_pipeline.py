@@ -0,0 +1,61 @@
+"""
+Whole-reply TTS versus the sentence pipeline, against the stub Zonos.
+
+    python tools/benchmark_tts_pipeline.py --zonos-concurrency 1
+
+Reports time to first audio and to the final joined WAV for a multi-sentence
+reply. The stub renders in time proportional to text length, and
+--zonos-concurrency mirrors the Gradio queue's concurrency limit.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from load_test import prepare_workdir
+from stub_servers import install_stub_zonos
+from tts_pipeline import split_sentences, wav_duration
+
+REPLY = ("Well now, that's a fair question. The rain stopped around noon, and the still has been running steady since. "
+         "I filled every canteen we had, which counts as a good day out here. "
+         "Still, there were tracks by the east fence I didn't like the look of. "
+         "Keep your lamp low tonight, friend.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-reply and pipelined Zonos synthesis")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub Zonos fixed seconds per call")
+    parser.add_argument("--per-char", type=float, default=0.01, help="stub Zonos seconds per character")
+    parser.add_argument("--zonos-concurrency", type=int, default=1, help="calls Zonos renders at once")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    install_stub_zonos(latency=args.latency, per_char=args.per_char, concurrency=args.zonos_concurrency)
+    import app as backend
+    backend.ZONOS_SETTINGS["randomize_seed"] = True   # measure Zonos, not the audio cache
+
+    whole, first, total = [], [], []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        single = backend.synthesize_zonos(REPLY, "jace")
+        whole.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        joined, first_audio_ms, _ = backend.synthesize_reply(REPLY, "jace")
+        total.append(time.perf_counter() - start)
+        first.append(first_audio_ms / 1000)
+
+    print(f"\n{len(split_sentences(REPLY))} sentences, {len(REPLY)} chars, "
+          f"stub {args.latency}s + {args.per_char}s/char, Zonos concurrency {args.zonos_concurrency}, "
+          f"pipeline depth {backend.TTS_PIPELINE_DEPTH}")
+    print(f"{'whole reply, first audio = done':>34}: {statistics.median(whole):6.2f}s")
+    print(f"{'pipelined, first audio':>34}: {statistics.median(first):6.2f}s")
+    print(f"{'pipelined, joined WAV done':>34}: {statistics.median(total):6.2f}s")
+    print(f"{'audio length whole / joined':>34}: {wav_duration(single):6.2f}s / {wav_duration(joined):.2f}s")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
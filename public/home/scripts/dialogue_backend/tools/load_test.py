@@ -0,0 +1,163 @@
+"""
+Concurrent-player load test against stub Ollama/Zonos.
+
+    python tools/load_test.py --mode asgi --sessions 50 --turns 3
+    python tools/load_test.py --mode flask --sessions 50 --turns 3
+
+Each session plays form turns (POST /npc/<id>, following the redirect to
+the rendered page) against one of --npcs NPCs. The backend runs in this
+process, in a scratch folder, on the threaded Flask server or on hypercorn.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from stub_servers import StubZonosClient, install_stub_zonos
+
+def prepare_workdir():
+    """Scratch cwd with the roster and voices, so memory and audio never touch the real folders."""
+    workdir = tempfile.mkdtemp(prefix='dialogue-load-')
+    shutil.copytree(os.path.join(BACKEND_DIR, 'data'), os.path.join(workdir, 'data'))
+    shutil.copytree(os.path.join(BACKEND_DIR, 'static', 'voices'), os.path.join(workdir, 'static', 'voices'))
+    os.chdir(workdir)
+    return workdir
+
+def start_stub_ollama(port, latency, token_delay=0.01, fail_rate=0.0):
+    """Stub Ollama in a child process, so its threads don't count against the backend."""
+    proc = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'tools', 'stub_servers.py'),
+                             '--port', str(port), '--latency', str(latency), '--token-delay', str(token_delay),
+                             '--fail-rate', str(fail_rate)], stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()   # "Stub Ollama at ..." once it is listening
+    return proc, f"http://127.0.0.1:{port}/api/chat"
+
+def serve_flask(flask_app, port):
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)   # no access log line per request
+    server = make_server('127.0.0.1', port, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='flask-server', daemon=True).start()
+    return server.shutdown
+
+def serve_asgi(asgi_app, port):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(asgi_app, config, shutdown_trigger=stop.wait))
+
+    threading.Thread(target=run, name='asgi-server', daemon=True).start()
+    return lambda: loop.call_soon_threadsafe(stop.set)
+
+async def wait_until_up(base_url, timeout=15):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                await client.get(f"{base_url}/maintenance/status")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+async def run_sessions(base_url, sessions, turns, npcs):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=sessions * 2)
+
+    async def session(i):
+        npc_id = f"loadnpc{i % npcs}"
+        async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits, follow_redirects=True) as client:
+            for turn in range(turns):
+                start = time.perf_counter()
+                try:
+                    r = await client.post(f"/npc/{npc_id}", data={'user_input':f"Session {i}, turn {turn}: any news?"})
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    errors.append(repr(e))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return time.perf_counter() - start, latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the dialogue backend with stub LLM/TTS servers")
+    parser.add_argument("--mode", choices=["asgi", "flask"], default="asgi")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent players")
+    parser.add_argument("--turns", type=int, default=3, help="turns per player")
+    parser.add_argument("--npcs", type=int, default=25, help="distinct NPCs the players talk to")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub Ollama seconds per call")
+    parser.add_argument("--tts-latency", type=float, default=1.0, help="stub Zonos seconds per call")
+    parser.add_argument("--tts-concurrency", type=int, default=None, help="stub Zonos calls served at once (default unlimited)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--stub-port", type=int, default=5056)
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    ollama, ollama_url = start_stub_ollama(args.stub_port, args.llm_latency)
+    install_stub_zonos(latency=args.tts_latency, concurrency=args.tts_concurrency)
+    import app as backend
+    backend.OLLAMA_URL = ollama_url
+
+    if args.mode == "asgi":
+        import asgi_app
+        stop = serve_asgi(asgi_app.app, args.port)
+    else:
+        stop = serve_flask(backend.app, args.port)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    peak_threads = threading.active_count()
+    sampling = True
+
+    def sample_threads():
+        nonlocal peak_threads
+        while sampling:
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.05)
+
+    async def run():
+        await wait_until_up(base_url)
+        return await run_sessions(base_url, args.sessions, args.turns, args.npcs)
+
+    threading.Thread(target=sample_threads, daemon=True).start()
+    wall, latencies, errors = asyncio.run(run())
+    sampling = False
+    llm_calls = httpx.get(ollama_url).json()['calls']
+    stop()
+    ollama.terminate()
+    backend.memory_store.flush()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    done = len(latencies)
+    print(f"\nmode={args.mode} sessions={args.sessions} turns/session={args.turns} npcs={args.npcs} "
+          f"stub latency llm={args.llm_latency}s tts={args.tts_latency}s tts concurrency={args.tts_concurrency or 'unlimited'}")
+    print(f"completed turns: {done}/{args.sessions * args.turns}, errors: {len(errors)}")
+    if errors:
+        print(f"first error: {errors[0]}")
+    if latencies:
+        latencies.sort()
+        print(f"throughput:      {done / wall:.2f} turns/s over {wall:.1f}s")
+        print(f"latency p50:     {statistics.median(latencies):.2f}s")
+        print(f"latency p95:     {latencies[int(0.95 * (done - 1))]:.2f}s")
+        print(f"latency max:     {latencies[-1]:.2f}s")
+    print(f"peak threads:    {peak_threads}")
+    print(f"LLM calls:       {llm_calls}, TTS calls: {StubZonosClient.calls}")
+
+if __name__ == "__main__":
+    main()
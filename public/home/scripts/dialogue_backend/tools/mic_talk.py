@@ -1,10 +1,18 @@
+import atexit
+import base64
+import os
+import tempfile
 import speech_recognition as sr
 import requests
-from zonos_tts import synthesize_and_play
+from zonos_tts import play_audio, synthesize_and_play
 
 FLASK_SERVER_URL = "http://localhost:5000"
 DEFAULT_NPC_ID = "jace"
 
+# Temp files of replies already handed to the player; removed on the next turn,
+# since xdg-open/start return before playback ends
+played = []
+
 def listen_for_input():
     recognizer = sr.Recognizer()
     with sr.Microphone() as source:
@@ -24,38 +32,51 @@ def listen_for_input():
 
 def send_and_listen_response(user_input, npc_id):
     try:
+        # One round trip: the server returns the reply and the speech it already rendered
         response = requests.post(
-            f"{FLASK_SERVER_URL}/npc/{npc_id}",
-            data={"user_input": user_input}
+            f"{FLASK_SERVER_URL}/npc/{npc_id}/turn",
+            json={"user_input": user_input, "include_audio": True}
         )
 
         if response.status_code == 200:
-            print(f"Sent to {npc_id.capitalize()} successfully.")
-
-            # Extract NPC reply and emotion
-            npc_response, npc_emotion = extract_npc_response(npc_id)
-            if npc_response:
-                print(f"{npc_id.capitalize()} says ({npc_emotion}): {npc_response}")
-                synthesize_and_play(npc_response, emotion=npc_emotion)
+            turn = response.json()
+            npc_response, npc_emotion = turn["reply"], turn["emotion"].strip().lower()
+            print(f"{npc_id.capitalize()} says ({npc_emotion}): {npc_response}")
+            if turn.get("audio_base64"):
+                play_reply(turn["audio_base64"], turn.get("audio_format", "wav"))
+            else:
+                # The server's TTS failed; render it here instead
+                synthesize_and_play(npc_response, npc_id=npc_id, emotion=npc_emotion)
 
         else:
             print(f"Failed to send input: {response.status_code}")
     except Exception as e:
         print(f"Failed to connect: {e}")
 
-def extract_npc_response(npc_id):
-    """Pull the latest reply and emotion from memory."""
-    try:
-        memory = requests.get(f"{FLASK_SERVER_URL}/npc/{npc_id}/memory").json()
-        last = memory[-1]
-        if 'ai' in last and 'emotion' in last:
-            return last['ai'], last['emotion'].strip().lower()
-        elif 'ai' in last:
-            return last['ai'], "neutral"
-        return None, "neutral"
-    except Exception as e:
-        print(f"Failed to fetch memory: {e}")
-        return None, "neutral"
+def play_reply(audio_base64, audio_format="wav"):
+    """Play the server's audio; the previous reply's temp file is deleted first so a long session doesn't fill the temp dir."""
+    remove_played()
+    path = save_audio(audio_base64, audio_format)
+    played.append(path)
+    play_audio(path, wait=True)
+
+@atexit.register
+def remove_played():
+    """Delete temp files of earlier replies; any still open in the player are retried next time."""
+    for path in played[:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:   # e.g. still open in the player on Windows
+            continue
+        played.remove(path)
+
+def save_audio(audio_base64, audio_format="wav"):
+    fd, path = tempfile.mkstemp(suffix=f".{audio_format}")
+    with os.fdopen(fd, "wb") as f:
+        f.write(base64.b64decode(audio_base64))
+    return path
 
 if __name__ == "__main__":
     while True:
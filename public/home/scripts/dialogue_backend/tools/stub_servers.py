@@ -0,0 +1,176 @@
+"""
+Local stand-ins for Ollama and Zonos so the backend can be load-tested and
+benchmarked offline.
+
+StubOllama is a real HTTP server speaking the /api/chat subset app.py uses
+(plain and NDJSON streaming replies); GET returns {"calls": n}. Every
+reply ends with a call number so the TTS cache never hides Zonos load.
+Run it as `python tools/stub_servers.py --port N` to keep its threads out
+of the process under test. Zonos is reached through
+gradio_client.Client, so StubZonosClient replaces that class instead of
+re-implementing Gradio's queue protocol; install_stub_zonos() must run
+before app.py is imported. Both take a fail_rate for failure injection
+(HTTP 500 from Ollama, an exception from Zonos), drawn from a seeded RNG
+so runs are repeatable.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import sys
+import wave
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections isn't worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+STUB_REPLY = "I hear you, stranger. The wasteland keeps its secrets close! Stay near the fire tonight."
+
+class StubOllama:
+    """Threaded /api/chat server that answers after a fixed latency, streaming a word per token_delay."""
+    def __init__(self, latency=0.2, token_delay=0.01, reply=STUB_REPLY, port=0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply = reply
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_json({"calls":stub.calls, "failures":stub.failures})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    stub.calls += 1
+                    reply = f"{stub.reply} ({stub.calls})"
+                    fail = stub.rng.random() < stub.fail_rate
+                    stub.failures += fail
+                time.sleep(stub.latency)
+                if fail:
+                    self.send_json({"error":"injected failure"}, status=500)
+                    return
+                if body.get('stream'):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/x-ndjson')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for word in reply.split(' '):
+                        self.write_chunk({"message":{"content":word + ' '}, "done":False})
+                        time.sleep(stub.token_delay)
+                    self.write_chunk({"message":{"content":""}, "done":True})
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                self.send_json({"message":{"content":reply}, "done":True})
+
+            def send_json(self, data, status=200):
+                out = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def write_chunk(self, part):
+                line = json.dumps(part).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+        self.server = QuietServer(('127.0.0.1', port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/chat"
+
+    def start(self):
+        """Serve from a background thread; returns self."""
+        threading.Thread(target=self.server.serve_forever, name='stub-ollama', daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def silent_wav(seconds=0.5, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b'\0\0' * int(seconds * rate))
+    return buffer.getvalue()
+
+class StubZonosClient:
+    """
+    Drop-in for gradio_client.Client: predict() blocks for `latency` plus
+    `per_char` per character of text and returns a WAV path. Like a Gradio
+    event with a concurrency_limit, at most `concurrency` (set through
+    install_stub_zonos) calls render at once; the rest queue.
+    """
+    latency = 0.5
+    per_char = 0.0
+    fail_rate = 0.0
+    rng = random.Random(0)
+    slots = None
+    calls = 0
+    failures = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def predict(self, **kwargs):
+        text = kwargs.get('text', '')
+        with StubZonosClient.slots or nullcontext():
+            time.sleep(StubZonosClient.latency + StubZonosClient.per_char * len(text))
+        StubZonosClient.calls += 1
+        if StubZonosClient.rng.random() < StubZonosClient.fail_rate:
+            StubZonosClient.failures += 1
+            raise RuntimeError("stub Zonos: injected failure")
+        # Length roughly tracks the text, like real speech
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(silent_wav(min(0.05 * len(text), 60)))
+        return path, None
+
+def install_stub_zonos(latency=0.5, per_char=0.0, concurrency=None, fail_rate=0.0):
+    import gradio_client
+    from zonos_client import ZonosConnection
+    StubZonosClient.latency = latency
+    StubZonosClient.per_char = per_char
+    StubZonosClient.fail_rate = fail_rate
+    StubZonosClient.slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+    gradio_client.Client = StubZonosClient
+    gradio_client.handle_file = lambda path: path
+    # No Zonos server to probe; a failed probe would drop the stub client and
+    # turn one injected failure into a backoff window of refused calls
+    ZonosConnection.probe = lambda self: True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a stub Ollama /api/chat")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds per streamed word")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    args = parser.parse_args()
+    stub = StubOllama(latency=args.latency, token_delay=args.token_delay, port=args.port, fail_rate=args.fail_rate)
+    print(f"Stub Ollama at {stub.url}", flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,10 +1,24 @@
-from gradio_client import Client, handle_file
 import os
+import sys
 import time
 
+# Shared helpers live next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_cache import AudioCache
+from tts_pipeline import render_pipelined, wav_duration
+from emotion import emotion_settings
+from zonos_client import VoiceRegistry, ZonosConnection
+
 # Zonos TTS Server
 ZONOS_URL = "http://127.0.0.1:7860/"
-client = Client(ZONOS_URL)
+zonos = ZonosConnection(ZONOS_URL)   # connects on the first synthesis, not at import
+voices = VoiceRegistry(zonos)        # each speaker clip is uploaded once, not per sentence
+
+# Same on-disk cache as app.py (run from the dialogue_backend folder)
+TTS_CACHE_FOLDER = "tts_cache"
+TTS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+audio_cache = AudioCache(TTS_CACHE_FOLDER, TTS_CACHE_MAX_BYTES)
+PIPELINE_DEPTH = 2   # Zonos requests in flight while playing
 
 # Default voice settings
 DEFAULT_SETTINGS = {
@@ -20,55 +34,16 @@ DEFAULT_SETTINGS = {
     "cfg_scale": 2,
     "min_p": 0.15,
     "seed": 420,
-    "randomize_seed": True,
+    "randomize_seed": False,  # True gives a fresh take every call but bypasses the audio cache
     "unconditional_keys": ["emotion"]
 }
 
-# Emotion-based modifiers
-EMOTION_PROFILES = {
-    "angry": {
-        "e6": 0.9,  # Anger
-        "e4": 0.1,  # Fear
-        "speaking_rate": 18,
-        "pitch_std": 60
-    },
-    "sad": {
-        "e2": 0.8,  # Sadness
-        "speaking_rate": 10,
-        "pitch_std": 30
-    },
-    "happy": {
-        "e1": 0.9,  # Happiness
-        "speaking_rate": 17,
-        "pitch_std": 50
-    },
-    "fearful": {
-        "e4": 0.8,  # Fear
-        "speaking_rate": 16,
-        "pitch_std": 55
-    },
-    "neutral": {
-        "e8": 0.8,  # Neutral
-        "speaking_rate": 15,
-        "pitch_std": 45
-    },
-    "disgusted": {
-        "e3": 0.9,  # Disgust
-        "speaking_rate": 13,
-        "pitch_std": 40
-    }
-}
-
 def synthesize_and_play(text, npc_id="jace", emotion="neutral"):
     if not text.strip():
         print("Nothing to synthesize.")
         return
 
-    settings = DEFAULT_SETTINGS.copy()
-
-    # Apply emotion modifications
-    profile = EMOTION_PROFILES.get(emotion.lower(), EMOTION_PROFILES["neutral"])
-    settings.update(profile)
+    settings = emotion_settings(DEFAULT_SETTINGS, emotion)
 
     speaker_file_path = f"static/voices/{npc_id}.mp3"
     
@@ -76,43 +51,64 @@ def synthesize_and_play(text, npc_id="jace", emotion="neutral"):
         print(f"No specific speaker audio found for {npc_id}. Using fallback voice (robot.mp3).")
         speaker_file_path = "static/voices/robot.mp3"
 
+    # Render sentence by sentence and start playing the first while the rest are generated
+    started = time.time()
     try:
-        result = client.predict(
-            model_choice=settings["model_choice"],
-            text=text,
-            language=settings["language"],
-            speaker_audio=handle_file(speaker_file_path),
-            prefix_audio=settings["prefix_audio"],
-            e1=settings.get("e1", 0.05),
-            e2=settings.get("e2", 0.05),
-            e3=settings.get("e3", 0.05),
-            e4=settings.get("e4", 0.05),
-            e5=settings.get("e5", 0.05),
-            e6=settings.get("e6", 0.05),
-            e7=settings.get("e7", 0.1),
-            e8=settings.get("e8", 0.2),
-            vq_single=settings["vq_single"],
-            fmax=settings["fmax"],
-            pitch_std=settings["pitch_std"],
-            speaking_rate=settings["speaking_rate"],
-            dnsmos_ovrl=settings["dnsmos_ovrl"],
-            speaker_noised=settings["speaker_noised"],
-            cfg_scale=settings["cfg_scale"],
-            min_p=settings["min_p"],
-            seed=settings["seed"],
-            randomize_seed=settings["randomize_seed"],
-            unconditional_keys=settings["unconditional_keys"],
-            api_name="/generate_audio"
-        )
-
-        audio_path = result[0]
-        print(f"Audio generated at: {audio_path}")
-
-        if os.path.exists(audio_path):
-            os.system(f'start {audio_path}' if os.name == 'nt' else f'xdg-open "{audio_path}"')
-            time.sleep(1)
-        else:
-            print("Failed to find generated audio file.")
+        chunks = render_pipelined(text, lambda sentence: synthesize_chunk(sentence, speaker_file_path, settings),
+                                  PIPELINE_DEPTH)
+        for index, sentence, audio_path in chunks:
+            if index == 0:
+                print(f"First audio after {(time.time() - started) * 1000:.0f} ms")
+            play_audio(audio_path, wait=True)
 
     except Exception as e:
         print(f"Error during TTS synthesis: {e}")
+
+def synthesize_chunk(text, speaker_file_path, settings):
+    """Render one piece of text through Zonos (or the audio cache); returns the audio path, only to be read."""
+    key = audio_cache.key_for(text, speaker_file_path, settings)
+    audio_path = key and audio_cache.fetch(key, copy=False)   # played in place, so no temp copy is left behind
+    if audio_path:
+        print(f"Audio cache hit: {audio_path}")
+        return audio_path
+
+    result = voices.predict(
+        speaker_file_path,
+        model_choice=settings["model_choice"],
+        text=text,
+        language=settings["language"],
+        prefix_audio=settings["prefix_audio"],
+        e1=settings.get("e1", 0.05),
+        e2=settings.get("e2", 0.05),
+        e3=settings.get("e3", 0.05),
+        e4=settings.get("e4", 0.05),
+        e5=settings.get("e5", 0.05),
+        e6=settings.get("e6", 0.05),
+        e7=settings.get("e7", 0.1),
+        e8=settings.get("e8", 0.2),
+        vq_single=settings["vq_single"],
+        fmax=settings["fmax"],
+        pitch_std=settings["pitch_std"],
+        speaking_rate=settings["speaking_rate"],
+        dnsmos_ovrl=settings["dnsmos_ovrl"],
+        speaker_noised=settings["speaker_noised"],
+        cfg_scale=settings["cfg_scale"],
+        min_p=settings["min_p"],
+        seed=settings["seed"],
+        randomize_seed=settings["randomize_seed"],
+        unconditional_keys=settings["unconditional_keys"],
+        api_name="/generate_audio"
+    )
+    audio_path = result[0]
+    print(f"Audio generated at: {audio_path}")
+    if key and os.path.exists(audio_path):
+        audio_cache.store(key, audio_path)
+    return audio_path
+
+def play_audio(audio_path, wait=False):
+    """Open audio in the system player; with wait, return only once it has had time to finish."""
+    if os.path.exists(audio_path):
+        os.system(f'start {audio_path}' if os.name == 'nt' else f'xdg-open "{audio_path}"')
+        time.sleep(max(1, wav_duration(audio_path) or 0) if wait else 1)
+    else:
+        print("Failed to find generated audio file.")
@@ -0,0 +1,111 @@
+import hashlib, json, os, shutil, tempfile, threading
+from collections import OrderedDict
+
+class AudioCache:
+    """
+    Content-addressed on-disk cache of synthesized audio, shared by app.py
+    and tools/zonos_tts.py. The key covers the normalized text, the speaker
+    reference file's content, and every synthesis setting (which includes
+    the emotion profile). Requests with randomize_seed set are never cached.
+    Files are evicted least-recently-used first once max_bytes is exceeded.
+    """
+    def __init__(self, folder, max_bytes):
+        self.folder    = folder
+        self.max_bytes = max_bytes
+        self.lock      = threading.Lock()
+        self.entries   = OrderedDict()   # key -> size, least recently used first
+        self.speaker_hashes = {}         # (path, mtime, size) -> sha256
+        self.counters  = {'hits':0, 'misses':0, 'bypassed':0, 'stored':0, 'evicted':0}
+        os.makedirs(folder, exist_ok=True)
+        files = [(fn, os.stat(os.path.join(folder, fn))) for fn in os.listdir(folder) if fn.endswith('.wav')]
+        for fn, st in sorted(files, key=lambda f: f[1].st_mtime):
+            self.entries[fn[:-4]] = st.st_size
+
+    def _speaker_hash(self, path):
+        st = os.stat(path)
+        sig = (path, st.st_mtime_ns, st.st_size)
+        if sig not in self.speaker_hashes:
+            with open(path, 'rb') as f:
+                self.speaker_hashes[sig] = hashlib.sha256(f.read()).hexdigest()
+        return self.speaker_hashes[sig]
+
+    def key_for(self, text, speaker_path, settings):
+        """Cache key for a request, or None (counted as bypassed) when its seed is randomized or the speaker file is missing."""
+        if settings.get('randomize_seed') or not os.path.exists(speaker_path):
+            with self.lock:
+                self.counters['bypassed'] += 1
+            return None
+        material = {
+            'text': " ".join(text.split()),
+            'speaker': self._speaker_hash(speaker_path),
+            'settings': settings,
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.wav")
+
+    def fetch(self, key, copy=True):
+        """
+        Path to a private copy of the cached audio (safe to move), or None on
+        a miss. With copy=False it is the cache file itself, for callers that
+        only read it and must not move or delete it.
+        """
+        with self.lock:
+            if key not in self.entries or not os.path.exists(self._path(key)):
+                self.entries.pop(key, None)
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            os.utime(self._path(key))
+        if not copy:
+            return self._path(key)
+        fd, private = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        shutil.copyfile(self._path(key), private)
+        return private
+
+    def store(self, key, audio_path):
+        """
+        Copy freshly synthesized audio into the cache and evict down to
+        max_bytes. Returns False (after logging) if it couldn't be stored;
+        the caller's audio is untouched either way.
+        """
+        # A temp file per call: two turns may render the same line at once
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.folder)
+        os.close(fd)
+        try:
+            shutil.copyfile(audio_path, tmp)
+            os.replace(tmp, self._path(key))
+            size = os.path.getsize(self._path(key))
+        except OSError as e:
+            print(f"Could not cache audio for {key}:", e)
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            return False
+        with self.lock:
+            self.entries[key] = size
+            self.entries.move_to_end(key)
+            self.counters['stored'] += 1
+            while sum(self.entries.values()) > self.max_bytes and len(self.entries) > 1:
+                old, _ = self.entries.popitem(last=False)
+                try:
+                    os.remove(self._path(old))
+                except FileNotFoundError:
+                    pass
+                self.counters['evicted'] += 1
+        return True
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_rate': round(self.counters['hits'] / lookups, 3) if lookups else None,
+                'entries': len(self.entries),
+                'bytes': sum(self.entries.values()),
+                'max_bytes': self.max_bytes,
+            }
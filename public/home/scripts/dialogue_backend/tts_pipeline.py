@@ -0,0 +1,63 @@
+import re, wave
+from concurrent.futures import ThreadPoolExecutor
+
+# A sentence ends at . ! ? or … (plus any closing quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r'[.!?…]+["\'\)\]”’]*\s+')
+
+def pop_sentences(buffer):
+    """Split complete sentences off the front of buffer; returns (sentences, remainder)."""
+    sentences, start = [], 0
+    for match in SENTENCE_END.finditer(buffer):
+        sentence = buffer[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, buffer[start:]
+
+def split_sentences(text):
+    sentences, rest = pop_sentences(text)
+    return sentences + ([rest.strip()] if rest.strip() else [])
+
+def render_pipelined(text, synthesize, max_in_flight=2):
+    """
+    Synthesize text one sentence at a time with at most max_in_flight calls
+    running at once. Yields (index, sentence, audio) in sentence order, each
+    as soon as it and every chunk before it are done, so the caller can play
+    or stream chunk 0 while later ones are still rendering.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='tts-pipeline') as pool:
+        jobs = [pool.submit(synthesize, sentence) for sentence in sentences]
+        try:
+            for index, (sentence, job) in enumerate(zip(sentences, jobs)):
+                yield index, sentence, job.result()
+        finally:
+            for job in jobs:
+                job.cancel()   # caller stopped early: skip what hasn't started
+
+def join_wavs(paths, out_path):
+    """Concatenate WAV files into out_path; returns False if they can't be joined."""
+    try:
+        with wave.open(paths[0], 'rb') as first:
+            params = first.getparams()
+        with wave.open(out_path, 'wb') as out:
+            out.setparams(params)
+            for path in paths:
+                with wave.open(path, 'rb') as chunk:
+                    if chunk.getparams()[:3] != params[:3]:
+                        raise wave.Error(f"{path} has a different format")
+                    out.writeframes(chunk.readframes(chunk.getnframes()))
+        return True
+    except (wave.Error, EOFError, OSError) as e:
+        print("Could not join audio chunks:", e)
+        return False
+
+def wav_duration(path):
+    """Length of a WAV file in seconds, or None if it can't be read as one."""
+    try:
+        with wave.open(path, 'rb') as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
@@ -0,0 +1,219 @@
+import os, threading, time, urllib.error, urllib.request
+
+class ZonosUnavailable(RuntimeError):
+    pass
+
+class ZonosConnection:
+    """
+    The gradio_client.Client for the Zonos server, created on first use
+    instead of at import, so a process starts without waiting on (or
+    needing) the TTS server. gradio_client itself is imported lazily too.
+
+    start() runs a background thread that warms the client up, then probes
+    the server every probe_interval seconds. A failed connect or probe
+    drops the client and retries with exponential backoff (backoff = (first,
+    max) seconds), so a Zonos restart is picked up without restarting us.
+    While backing off, predict() fails fast with ZonosUnavailable.
+    """
+    def __init__(self, url, probe_interval=15, backoff=(1, 30), probe_timeout=3):
+        self.url = url
+        self.probe_interval = probe_interval
+        self.backoff = backoff
+        self.probe_timeout = probe_timeout
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.client = None
+        self.failures = 0          # consecutive failed connects/probes
+        self.predict_errors = 0    # consecutive failed predict() calls on the current client
+        self.retry_at = 0.0
+        self.last_error = None
+        self.connect_ms = None
+        self.probe_ms = None
+        self.started = False
+
+    def start(self):
+        """Warm up and keep probing from a daemon thread; returns self."""
+        if not self.started:
+            self.started = True
+            threading.Thread(target=self._run, name='zonos-warmup', daemon=True).start()
+        return self
+
+    def get(self):
+        """The connected client, connecting now if needed."""
+        with self.lock:
+            if self.client is not None:
+                return self.client
+            wait = self.retry_at - time.monotonic()
+            if wait > 0:
+                raise ZonosUnavailable(f"Zonos at {self.url} is down (retry in {wait:.0f}s): {self.last_error}")
+            started = time.perf_counter()
+            try:
+                import gradio_client   # ~0.35 s to import, so only once it's needed
+                self.client = gradio_client.Client(self.url)
+            except Exception as e:
+                self._failed(e)
+                raise ZonosUnavailable(f"Could not connect to Zonos at {self.url}: {e}") from e
+            self.connect_ms = round((time.perf_counter() - started) * 1000)
+            self.failures = self.predict_errors = 0
+            self.last_error = None
+            print(f"Connected to Zonos at {self.url} in {self.connect_ms} ms")
+            return self.client
+
+    def handle_file(self, path):
+        import gradio_client
+        return gradio_client.handle_file(path)
+
+    def predict(self, **kwargs):
+        client = self.get()
+        try:
+            result = client.predict(**kwargs)
+        except Exception:
+            with self.lock:
+                if self.client is client:
+                    self.predict_errors += 1
+                    if self.predict_errors >= 3:   # server may have restarted under us
+                        self._failed("repeated predict failures")
+            self.wakeup.set()   # probe now rather than at the next interval
+            raise
+        self.predict_errors = 0
+        return result
+
+    def _failed(self, error):
+        """Drop the client and schedule a reconnect; caller holds the lock. error: exception or message."""
+        self.client = None
+        self.failures += 1
+        first, most = self.backoff
+        self.retry_at = time.monotonic() + min(first * 2 ** (self.failures - 1), most)
+        self.last_error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def probe(self):
+        """True if the server answers HTTP at all (any status below 500)."""
+        started = time.perf_counter()
+        try:
+            urllib.request.urlopen(self.url, timeout=self.probe_timeout).close()
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                self.last_error = f"HTTP {e.code} from health probe"
+                return False
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        self.probe_ms = round((time.perf_counter() - started) * 1000)
+        return True
+
+    def _run(self):
+        while True:
+            if self.client is None:
+                try:
+                    self.get()
+                except ZonosUnavailable as e:
+                    print(e)
+            elif not self.probe():
+                with self.lock:
+                    self._failed(self.last_error or "health probe failed")
+                print(f"Zonos health probe failed: {self.last_error}")
+            wait = self.probe_interval if self.client is not None else max(self.retry_at - time.monotonic(), 0.1)
+            self.wakeup.wait(wait)
+            self.wakeup.clear()
+
+    def status(self):
+        if self.client is not None:
+            state = 'ready'
+        elif self.failures:
+            state = 'down'
+        else:
+            state = 'connecting' if self.started else 'idle'
+        return {'state':state, 'url':self.url, 'connect_ms':self.connect_ms, 'probe_ms':self.probe_ms,
+                'failures':self.failures, 'retry_in':max(round(self.retry_at - time.monotonic(), 1), 0) if self.client is None else 0,
+                'last_error':self.last_error}
+
+class VoiceRegistry:
+    """
+    Speaker reference clips uploaded to Zonos once per server session.
+
+    gradio_client uploads every handle_file() argument again on every
+    predict(), so each utterance re-sent the NPC's voice clip. Here a clip
+    is uploaded once, keyed by path, mtime and size, and later calls pass
+    the server-side path (a FileData dict without "meta", which
+    gradio_client leaves alone). Handles belong to the connected client,
+    so a reconnect (new server session) uploads again, and a call that
+    fails with a reused handle is retried once after a fresh upload in
+    case the server forgot the file. Clients without an upload endpoint
+    (the stubs) fall back to handle_file().
+    """
+    def __init__(self, zonos):
+        self.zonos = zonos
+        self.lock = threading.Lock()
+        self.handles = {}   # (abspath, mtime_ns, size) -> (client, file dict, upload ms)
+        self.counters = {'uploads':0, 'reused':0, 'reuploads':0, 'uncached':0,
+                         'bytes_uploaded':0, 'upload_ms':0, 'bytes_saved':0, 'ms_saved':0}
+
+    def upload(self, client, path):
+        """Upload path through the client's /upload endpoint; returns the server-side path, or None."""
+        upload_url = getattr(client, 'upload_url', None)
+        if not upload_url:
+            return None
+        import httpx
+        with open(path, 'rb') as f:
+            r = httpx.post(upload_url, headers=getattr(client, 'headers', None), cookies=getattr(client, 'cookies', None),
+                           verify=getattr(client, 'ssl_verify', True), files=[("files", (os.path.basename(path), f))],
+                           **getattr(client, 'httpx_kwargs', {}))
+        r.raise_for_status()
+        return r.json()[0]
+
+    def speaker(self, path):
+        """(speaker_audio argument for path, whether it reuses an earlier upload)."""
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        client = self.zonos.get()
+        with self.lock:
+            entry = self.handles.get(key)
+            if entry and entry[0] is client:
+                self.counters['reused'] += 1
+                self.counters['bytes_saved'] += st.st_size
+                self.counters['ms_saved'] += entry[2]
+                return entry[1], True
+            started = time.perf_counter()
+            server_path = self.upload(client, path)
+            if server_path is None:
+                self.counters['uncached'] += 1
+                return self.zonos.handle_file(path), False
+            ms = round((time.perf_counter() - started) * 1000)
+            for old in [k for k in self.handles if k[0] == key[0]]:
+                del self.handles[old]   # older versions of the same file
+            handle = {'path':server_path, 'orig_name':os.path.basename(path)}
+            self.handles[key] = (client, handle, ms)
+            self.counters['uploads'] += 1
+            self.counters['bytes_uploaded'] += st.st_size
+            self.counters['upload_ms'] += ms
+            return handle, False
+
+    def forget(self, path):
+        with self.lock:
+            for key in [k for k in self.handles if k[0] == os.path.abspath(path)]:
+                del self.handles[key]
+
+    def predict(self, speaker_path, **kwargs):
+        """zonos.predict() with speaker_audio taken from the registry."""
+        speaker, reused = self.speaker(speaker_path)
+        try:
+            return self.zonos.predict(speaker_audio=speaker, **kwargs)
+        except ZonosUnavailable:
+            raise
+        except Exception as e:
+            if not reused:
+                raise
+            print(f"Re-uploading {speaker_path} after a failed call with its cached handle: {e}")
+            self.forget(speaker_path)
+            with self.lock:
+                self.counters['reuploads'] += 1
+            speaker, _ = self.speaker(speaker_path)
+            return self.zonos.predict(speaker_audio=speaker, **kwargs)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, voices=len(self.handles))
+        reused = stats['reused']
+        stats['bytes_saved_per_call'] = round(stats['bytes_saved'] / reused) if reused else 0
+        stats['ms_saved_per_call'] = round(stats['ms_saved'] / reused, 1) if reused else 0
+        return stats
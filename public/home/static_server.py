@@ -1,6 +1,15 @@
+import email.utils
 import http.server
+import os
+import socket
 import socketserver
 import sys
+import urllib.parse
+
+# Pre-built siblings served in place of the file when the client accepts them,
+# e.g. made with `gzip -k -9 big.glb` / `brotli -k big.glb` (best first)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+CACHE_CONTROL = "no-cache"   # always revalidate; the ETag turns that into a cheap 304
 
 class SafeHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """
@@ -18,16 +27,199 @@ class SafeHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             pass
 
 
+def parse_range(header, size):
+    """
+    (start, end) for a single `bytes=` range, False if it can't be satisfied,
+    or None if it should be ignored (other units, multiple ranges, garbage).
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0 or size == 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+def accepted_encodings(header):
+    """Content codings named in Accept-Encoding, without those refused with q=0."""
+    accepted = set()
+    for part in (header or "").split(','):
+        name, _, params = part.partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+class ProductionRequestHandler(SafeHTTPRequestHandler):
+    """
+    SafeHTTPRequestHandler for the threaded production server: keep-alive,
+    ETag/Last-Modified with 304s, single byte ranges (206) for media
+    seeking, pre-built .br/.gz siblings, and socket.sendfile() for bodies
+    (zero-copy os.sendfile where the platform has it). Directory listings,
+    redirects and 404s are left to SimpleHTTPRequestHandler.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = 30   # drop idle keep-alive connections
+
+    def setup(self):
+        super().setup()
+        # Headers and the sendfile() body are separate writes; without this,
+        # Nagle plus delayed ACKs stall every keep-alive response by ~40 ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        self.serve(head_only=False)
+
+    def do_HEAD(self):
+        self.serve(head_only=True)
+
+    def file_path(self):
+        """Filesystem path of the file a request names, or None to defer to the base class."""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urllib.parse.urlsplit(self.path).path.endswith('/'):
+                return None
+            for index in ("index.html", "index.htm"):
+                candidate = os.path.join(path, index)
+                if os.path.isfile(candidate):
+                    return candidate
+            return None
+        if path.endswith('/') or not os.path.isfile(path):
+            return None
+        return path
+
+    def pick_variant(self, path, mtime):
+        """(content coding or None, path to send), preferring a fresh precompressed sibling."""
+        accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in accepted:
+                try:
+                    if os.stat(path + suffix).st_mtime >= mtime:
+                        return encoding, path + suffix
+                except OSError:
+                    pass
+        return None, path
+
+    def not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since.tzinfo is not None and int(mtime) <= since.timestamp()
+        return False
+
+    def serve(self, head_only):
+        path = self.file_path()
+        if path is None:
+            return super().do_HEAD() if head_only else super().do_GET()
+        try:
+            st = os.stat(path)
+            range_header = self.headers.get('Range')
+            # Ranges index the identity body, so a range request never gets a compressed sibling
+            encoding, send_path = (None, path) if range_header else self.pick_variant(path, st.st_mtime)
+            f = open(send_path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            etag = f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}{"-" + encoding if encoding else ""}"'
+            last_modified = self.date_time_string(st.st_mtime)
+
+            if self.not_modified(etag, st.st_mtime):
+                self.send_response(304)
+                self.send_common_headers(etag, last_modified)
+                self.end_headers()
+                return
+
+            start, end, status = 0, size - 1, 200
+            if_range = self.headers.get('If-Range')
+            if range_header and (if_range is None or if_range.strip() in (etag, last_modified)):
+                span = parse_range(range_header, size)
+                if span is False:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if span:
+                    (start, end), status = span, 206
+
+            self.send_response(status)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Length", str(end - start + 1))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_common_headers(etag, last_modified)
+            self.end_headers()
+            if not head_only:
+                self.send_body(f, start, end - start + 1)
+
+    def send_common_headers(self, etag, last_modified):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def send_body(self, f, offset, count):
+        if count <= 0:
+            return
+        try:
+            self.connection.sendfile(f, offset, count)
+        except (ConnectionResetError, BrokenPipeError, TimeoutError):
+            # Client closed connection mid-transfer; ignore
+            self.close_connection = True
+
+class ProductionHTTPServer(http.server.ThreadingHTTPServer):
+    """One thread per connection, so a slow download doesn't stall everyone else."""
+    daemon_threads = True
+    request_queue_size = 128
+
+
 def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    production = '--production' in sys.argv[1:]
     port = 3057
-    if len(sys.argv) > 1:
+    if args:
         try:
-            port = int(sys.argv[1])
+            port = int(args[0])
         except ValueError:
-            print(f"Invalid port '{sys.argv[1]}', using default {port}")
-    handler = SafeHTTPRequestHandler  # renamed from Handler to handler for snake_case lint
-    with socketserver.TCPServer(("", port), handler) as httpd:
-        print(f"Serving HTTP on port {port} (static content) ...")
+            print(f"Invalid port '{args[0]}', using default {port}")
+    if production:
+        server_class, handler = ProductionHTTPServer, ProductionRequestHandler
+    else:
+        server_class, handler = socketserver.TCPServer, SafeHTTPRequestHandler  # renamed from Handler to handler for snake_case lint
+    with server_class(("", port), handler) as httpd:
+        mode = "threaded production" if production else "static content"
+        print(f"Serving HTTP on port {port} ({mode}) ...", flush=True)
         try:
             httpd.serve_forever()
         except KeyboardInterrupt: